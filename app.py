@@ -4,7 +4,10 @@ import folium
 import pandas as pd
 import numpy as np
 import plotly.express as px
-from utils import get_itslive, get_processed_data, get_future_dates
+from features import FeatureEngine
+from utils import get_itslive, get_processed_data, get_future_dates, resample_observations
+from timeseries_store import TimeSeriesStore
+from registry import ModelRegistry
 import json
 
 st.set_page_config(layout="wide")
@@ -22,6 +25,9 @@ if "manual_lat" not in st.session_state:
     st.session_state.manual_lat = 70.0
 if "manual_lon" not in st.session_state:
     st.session_state.manual_lon = -45.0
+if "feature_engine" not in st.session_state:
+    # una sola instancia por sesión: su caché por punto sobrevive entre clics
+    st.session_state.feature_engine = FeatureEngine()
 
 # Mapa base: centra y haz zoom si hay coordenadas seleccionadas
 if st.session_state.coords:
@@ -134,12 +140,21 @@ min_dt, max_dt = st.slider(
     step=1
 )
 
+# Agrupación temporal de las observaciones
+cadencia = st.selectbox(
+    "Agrupar observaciones (promedio ponderado por el error de v):",
+    options=[0, 6, 12, 30],
+    format_func=lambda d: "Sin agrupar" if d == 0 else f"Cada {d} días",
+)
+
 # Graficar datos
 if st.session_state.coords:
     if st.button("Graficar serie de tiempo"):
         with st.spinner("Descargando y graficando datos..."):
-            df = get_itslive([st.session_state.coords])
-            glacier = get_processed_data(df, min_dt=min_dt, max_dt=max_dt)
+            df = get_itslive([st.session_state.coords], store=TimeSeriesStore())
+            glacier = get_processed_data(df, min_dt=min_dt, max_dt=max_dt, compact=True)
+            if cadencia:
+                glacier = resample_observations(glacier, freq_days=cadencia)
             st.session_state.glacier = glacier  # Guarda el DataFrame en el estado de sesión
     # Mostrar la gráfica y la tabla si ya hay datos en el estado de sesión
     if "glacier" in st.session_state and not st.session_state.glacier.empty:
@@ -163,12 +178,41 @@ if st.session_state.coords:
             key="modelo_sel"
         )
 
+        busqueda = st.radio(
+            "Búsqueda de hiperparámetros:",
+            options=["halving", "grid"],
+            format_func=lambda b: "Successive halving (rápida)" if b == "halving" else "Grid search completa",
+            horizontal=True,
+            key="busqueda"
+        ) if modelo_sel == "XGBoost" else "grid"
+
+        motor_gbr = st.radio(
+            "Motor del regresor:",
+            options=["hist", "exact"],
+            format_func=lambda m: "Histogramas con parada temprana" if m == "hist" else "Exacto (GradientBoostingRegressor)",
+            horizontal=True,
+            key="motor_gbr"
+        ) if modelo_sel == "Regresor" else "exact"
+
+        usar_lags = st.checkbox(
+            "Agregar lags, ventanas móviles y armónicos (XGBoost y Regresor)",
+            key="usar_lags"
+        ) and modelo_sel != "ARIMA"
+
         # Botón para entrenar el modelo
         if st.button("Entrenar modelo de predicción"):
 
-            split_idx = int(len(glacier) * 0.66)
-            X = glacier[['year', 'month', 'dayofyear']]
-            y = glacier['v']
+            if usar_lags:
+                engine = st.session_state.feature_engine
+                X = engine.transform(glacier, key=tuple(st.session_state.coords))
+                # las primeras observaciones no tienen historia suficiente para los lags
+                con_historia = X.notna().all(axis=1).to_numpy()
+                X = X[con_historia]
+                y = glacier['v'][con_historia]
+            else:
+                X = glacier[['year', 'month', 'dayofyear']]
+                y = glacier['v']
+            split_idx = int(len(X) * 0.66)
             X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
             y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
 
@@ -188,12 +232,22 @@ if st.session_state.coords:
             )
             st.plotly_chart(fig, use_container_width=True)
 
+            # mismo punto, datos y configuración ya entrenados -> se lee del registro en disco
+            registry = ModelRegistry()
+            clave = ModelRegistry.key(
+                X_train, y_train,
+                coords=st.session_state.coords, min_dt=min_dt, max_dt=max_dt, model_name=modelo_sel,
+                params={"busqueda": busqueda, "motor_gbr": motor_gbr, "lags": usar_lags, "cadencia": cadencia},
+            )
+
             if modelo_sel == "XGBoost":
                 with st.spinner("Entrenando modelo XGBoost..."):
                     from model import get_xgboost_model
-                    model, cv_results = get_xgboost_model(X_train, y_train)
+                    model, cv_results, en_registro = registry.get_or_train(
+                        clave, lambda: get_xgboost_model(X_train, y_train, search=busqueda)
+                    )
                     st.session_state.model = model
-                    st.success(f"Modelo {modelo_sel} entrenado exitosamente.")
+                    st.success(f"Modelo {modelo_sel} {'cargado del registro' if en_registro else 'entrenado exitosamente'}.")
 
                     best_idx = cv_results['rank_test_score'].argmin()
                     mean_score = cv_results['mean_test_score'][best_idx]
@@ -204,17 +258,24 @@ if st.session_state.coords:
             elif modelo_sel == "Regresor":
                 with st.spinner("Entrenando modelo GBR..."):
                         from gbregresor_model import get_gbr_model
-                        model, scores = get_gbr_model(X_train,y_train)
+                        model, scores, en_registro = registry.get_or_train(
+                            clave, lambda: get_gbr_model(X_train, y_train, engine=motor_gbr)
+                        )
                         st.session_state.model = model
-                        st.success(f"Modelo {modelo_sel} entrenado exitosamente.")
+                        st.success(f"Modelo {modelo_sel} {'cargado del registro' if en_registro else 'entrenado exitosamente'}.")
                         st.write(f"Cross-validated neg_mean_squared_log_error: {-scores.mean():.4f} ± {scores.std():.4f}")
 
             elif modelo_sel=="ARIMA":
                 with st.spinner("Entrenando modelo ARIMA"):
                         from arima_model import get_arima_model
-                        model, scores = get_arima_model(X_train,y_train)
+                        model, scores, en_registro = registry.get_or_train(
+                            clave, lambda: get_arima_model(
+                                X_train, y_train, mode="refit",
+                                freq=pd.Timedelta(days=cadencia) if cadencia else "auto",
+                            )
+                        )
                         st.session_state.model=model
-                        st.success(f"Modelo {modelo_sel} entrenado exitosamente,")
+                        st.success(f"Modelo {modelo_sel} {'cargado del registro' if en_registro else 'entrenado exitosamente'}.")
                         st.write(f"Cross-validated neg_mean_squared_log_error: {-scores.mean():.4f} ± {scores.std():.4f}")
 
 
@@ -223,9 +284,15 @@ if st.session_state.coords:
             if st.session_state.model:
                 with st.spinner("Realizando predicciones..."):
 
-                    y_pred = st.session_state.model.predict(X_test)
                     future_dates = get_future_dates(X_test.index[-1], until='2030-12-31')
-                    future_predictions = model.predict(future_dates[['year', 'month', 'dayofyear']])
+                    if usar_lags:
+                        # pronóstico recursivo: los lags del test y del futuro salen de las predicciones
+                        historia = glacier[glacier.index < X_test.index[0]]
+                        y_pred = engine.forecast(st.session_state.model, historia, X_test.index)
+                        future_predictions = engine.forecast(model, glacier, future_dates.index)
+                    else:
+                        y_pred = st.session_state.model.predict(X_test)
+                        future_predictions = model.predict(future_dates[['year', 'month', 'dayofyear']])
 
                     # Graficar puntos reales y predicciones
                     fig = px.scatter(
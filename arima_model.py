@@ -1,4 +1,7 @@
 from statsmodels.tsa.arima.model import ARIMA
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import time
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import mean_squared_log_error
 import pandas as pd
@@ -11,6 +14,7 @@ class SklearnLikeARIMA:
         self.fitted_model = None
         self.fitted = False
         self.train_index = None
+        self.freq = None
     
     def _reconstruct_dates(self, X):
         if isinstance(X, pd.DataFrame):
@@ -31,43 +35,190 @@ class SklearnLikeARIMA:
             return pd.date_range(start=self.train_index[-1], periods=len(X) + 1, freq='MS')[1:]
 
 
-    def fit(self, X, y):
+    @staticmethod
+    def _regular_freq(index):
+        """Paso común de un índice de fechas sin repetidos cuyos saltos son múltiplos del menor (p. ej. la
+        salida de utils.resample_observations); None si las fechas son irregulares o si la rejilla quedaría
+        con más huecos que datos (fechas sueltas que solo coinciden en el día)."""
+        if len(index) < 2 or not index.is_unique:
+            return None
+        diffs = np.diff(index.values.astype("datetime64[ns]").astype("int64"))
+        step = diffs.min()
+        if step <= 0 or np.any(diffs % step) or diffs.sum() // step + 1 > 2 * len(index):
+            return None
+        return pd.Timedelta(step, unit="ns")
+
+    @staticmethod
+    def _snap(series, origin, freq, first_step=0):
+        """
+        Serie en la rejilla origin + k·freq (k >= first_step): cada fecha va al paso más cercano (promedio
+        si varias caen en el mismo), los pasos sin datos quedan NaN y lo anterior a first_step se descarta.
+        """
+        steps = np.round((pd.DatetimeIndex(series.index) - origin) / freq).astype("int64")
+        keep = steps >= first_step
+        binned = series[keep].groupby(steps[keep]).mean()
+        if binned.isna().all():
+            raise ValueError(f"ninguna observación cae en la rejilla de {freq} después de {origin}")
+        steps = np.arange(first_step, binned.index.max() + 1)
+        grid = pd.date_range(origin + first_step * freq, periods=len(steps), freq=freq)
+        return pd.Series(binned.reindex(steps).to_numpy(), index=grid)
+
+    def fit(self, X, y, start_params=None, freq="auto"):
+        """
+        Ajusta el ARIMA; start_params (p. ej. los de otro ajuste) arranca el optimizador cerca de la solución.
+        freq: paso de la rejilla de fechas; "auto" lo detecta en esta serie (_regular_freq), None ajusta por
+        posición y un pd.Timedelta (p. ej. la cadencia de utils.resample_observations) lo fija.
+        """
         fechas = self._reconstruct_dates(X)
         series = pd.Series(y.values, index=fechas).sort_index()
 
-        self.model = ARIMA(series, order=self.order)
-        self.fitted_model = self.model.fit()
-        self.fitted = True
+        # serie en rejilla regular: los intervalos sin datos quedan como NaN (el filtro de Kalman los omite)
+        self.freq = self._regular_freq(series.index) if isinstance(freq, str) and freq == "auto" else freq
+        if self.freq is not None:
+            self.freq = pd.Timedelta(self.freq)
+            series = self._snap(series, series.index[0], self.freq)
         self.train_index = series.index
+
+        # fechas irregulares: statsmodels no puede pronosticar sobre ellas, se ajusta por posición
+        self.model = ARIMA(series if self.freq is not None else series.reset_index(drop=True), order=self.order)
+        self.fitted_model = self.model.fit(start_params=start_params)
+        self.fitted = True
         return self
 
+    def append(self, X, y, refit=False):
+        """
+        Nuevo modelo con las observaciones (X, y), posteriores al entrenamiento, agregadas al estado del filtro.
+        Con refit=False no se reestiman los parámetros (solo una pasada del filtro de Kalman); con refit=True
+        se reestiman partiendo de los actuales.
+        """
+        if not self.fitted:
+            raise RuntimeError("Debes entrenar el modelo antes de agregar observaciones.")
+        fechas = self._reconstruct_dates(X)
+        series = pd.Series(y.values, index=fechas).sort_index()
+        if self.freq is not None:
+            # fechas fuera de la rejilla (p. ej. otro origen de resample_observations) van al paso más cercano
+            series = self._snap(series, self.train_index[-1], self.freq, first_step=1)
+
+        new = copy.copy(self)
+        new.fitted_model = self.fitted_model.append(series.to_numpy(), refit=refit)
+        new.model = new.fitted_model.model
+        new.train_index = self.train_index.append(series.index)
+        return new
+
+    def update(self, new_X, new_y):
+        """
+        Modelo con las observaciones nuevas agregadas al estado, sin reestimar parámetros (append con
+        refit=False). La actualización queda en updates.
+        """
+        from updates import record_update
+        start = time.perf_counter()
+        new = self.append(new_X, new_y, refit=False)
+        new.updates = list(getattr(self, "updates", []))
+        added = new.model.endog[len(self.train_index):]
+        n_obs = int(np.isfinite(added).sum())
+        record_update(
+            new, "arima_extend", new_X, time.perf_counter() - start, n_obs=n_obs, n_train=len(new.train_index)
+        )
+        return new
+
     def predict(self, X):
         if not self.fitted:
             raise RuntimeError("Debes entrenar el modelo antes de predecir.")
-        
-        n_steps = len(X)
-        pred = self.fitted_model.forecast(steps=n_steps)
 
         fechas_pred = self._reconstruct_dates(X)
+        if self.freq is not None:
+            # pronóstico hasta la última fecha pedida y valor del paso más cercano a cada fecha
+            last = self.train_index[-1]
+            n_steps = max(int(np.ceil((pd.DatetimeIndex(fechas_pred).max() - last) / self.freq)), 1)
+            pred = self.fitted_model.forecast(steps=n_steps)
+            return pred.reindex(pd.DatetimeIndex(fechas_pred), method="nearest").values
+
+        n_steps = len(X)
+        pred = self.fitted_model.forecast(steps=n_steps)
         pred.index = fechas_pred
         return pred.values
 
         
-def get_arima_model(X_train, y_train):
-    model = SklearnLikeARIMA(order=(9, 1, 2))
-    model.fit(X_train, y_train)
+def _score(m, X_v, y_v):
+    return -mean_squared_log_error(y_v, np.clip(m.predict(X_v), a_min=0, a_max=None))
 
-    tscv = TimeSeriesSplit(n_splits=5)
-    errors = []
+def detect_freq(X):
+    """Paso de rejilla común a todas las fechas de X (ver SklearnLikeARIMA._regular_freq), o None."""
+    fechas = pd.DatetimeIndex(SklearnLikeARIMA()._reconstruct_dates(X)).sort_values()
+    return SklearnLikeARIMA._regular_freq(fechas)
 
-    for train_idx, val_idx in tscv.split(X_train):
-        X_t, X_v = X_train.iloc[train_idx], X_train.iloc[val_idx]
-        y_t, y_v = y_train.iloc[train_idx], y_train.iloc[val_idx]
+def _converged(m):
+    return (m.fitted_model.mle_retvals or {}).get("converged", False)
+
+def _fit_full(X, y, order, start_params=None, freq="auto"):
+    """
+    Ajuste arrancando de start_params; si ese arranque falla (LinAlgError, p. ej. "LU decomposition error")
+    o no converge, se repite desde los parámetros iniciales de statsmodels.
+    """
+    if start_params is not None:
+        try:
+            m = SklearnLikeARIMA(order=order).fit(X, y, start_params=start_params, freq=freq)
+            if _converged(m):
+                return m
+        except np.linalg.LinAlgError:
+            pass
+    return SklearnLikeARIMA(order=order).fit(X, y, freq=freq)
+
+def _fold_error(X_t, y_t, X_v, y_v, order, start_params=None, freq="auto"):
+    return _score(_fit_full(X_t, y_t, order, start_params, freq), X_v, y_v)
+
+def get_arima_model(X_train, y_train, mode="refit", max_workers=None, refit_every=None, freq="auto"):
+    """
+    Entrena el ARIMA sobre todo X_train y lo evalúa con TimeSeriesSplit (5 folds).
+    Devuelve el modelo y los errores por fold (neg MSLE).
+
+    La rejilla de fechas (freq) se decide una sola vez para todos los folds y el modelo final: "auto" la
+    detecta sobre todo X_train (detect_freq); un pd.Timedelta (p. ej. la cadencia de
+    utils.resample_observations) o None (ajuste por posición) la fijan.
+
+    mode="refit": cada fold se ajusta desde cero, uno tras otro.
+    mode="parallel": se ajusta primero el fold más chico y, si convergió, sus parámetros son start_params
+    de los demás folds y del modelo completo (todos en la misma rejilla freq), que se ajustan a la vez en
+    un ProcessPoolExecutor (max_workers procesos). Un ajuste que falla o no converge desde esos
+    parámetros se repite sin ellos.
+    mode="rolling": origen móvil; se ajusta solo el primer fold y cada fold siguiente (y el modelo final)
+    agrega al estado las observaciones nuevas sin reestimar (SklearnLikeARIMA.append). Con refit_every=k
+    los parámetros se reestiman, partiendo de los actuales, cada k pasos.
+    """
+    order = (9, 1, 2)
+    if isinstance(freq, str) and freq == "auto":
+        freq = detect_freq(X_train)
+    tscv = TimeSeriesSplit(n_splits=5)
+    folds = [
+        (X_train.iloc[train_idx], y_train.iloc[train_idx], X_train.iloc[val_idx], y_train.iloc[val_idx])
+        for train_idx, val_idx in tscv.split(X_train)
+    ]
 
-        m = SklearnLikeARIMA(order=(9, 1, 2))
-        m.fit(X_t, y_t)
-        y_pred = m.predict(X_v)
-        error = mean_squared_log_error(y_v, np.clip(y_pred, a_min=0, a_max=None))
-        errors.append(-error)
+    if mode == "parallel":
+        seed = SklearnLikeARIMA(order=order).fit(*folds[0][:2], freq=freq)
+        # unos parámetros sin converger alejan al optimizador más de lo que lo acercan
+        start_params = seed.fitted_model.params.to_numpy() if _converged(seed) and seed.freq == freq else None
+        first_error = _score(seed, *folds[0][2:])
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            full = executor.submit(_fit_full, X_train, y_train, order, start_params, freq)
+            rest = [executor.submit(_fold_error, *fold, order, start_params, freq) for fold in folds[1:]]
+            errors = [first_error] + [f.result() for f in rest]
+            model = full.result()
+        return model, np.array(errors)
+    if mode == "rolling":
+        model = SklearnLikeARIMA(order=order).fit(*folds[0][:2], freq=freq)
+        errors = [_score(model, *folds[0][2:])]
+        ends = [len(fold[0]) for fold in folds] + [len(X_train)]
+        for k in range(1, len(ends)):
+            refit = bool(refit_every) and k % refit_every == 0
+            model = model.append(X_train.iloc[ends[k - 1]:ends[k]], y_train.iloc[ends[k - 1]:ends[k]], refit=refit)
+            if k < len(folds):
+                errors.append(_score(model, *folds[k][2:]))
+        return model, np.array(errors)
+    if mode != "refit":
+        raise ValueError(f"mode must be 'refit', 'parallel' or 'rolling', got {mode!r}")
 
+    model = SklearnLikeARIMA(order=order)
+    model.fit(X_train, y_train, freq=freq)
+    errors = [_fold_error(*fold, order, freq=freq) for fold in folds]
     return model, np.array(errors)
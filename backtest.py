@@ -0,0 +1,234 @@
+"""
+Backtesting común para todas las familias de modelos (XGBoost, GBR, ARIMA, DenseLSTM).
+
+Backtest arma una sola vez los folds de TimeSeriesSplit (índices y matrices float32 de entrenamiento y
+validación, más las partes en pandas que necesita ARIMA para reconstruir fechas), entrena cada modelo
+registrado en ADAPTERS sobre cada fold en paralelo (joblib) y guarda las predicciones de cada fold: volver
+a evaluar un modelo ya corrido, o pedir otra métrica, no reentrena nada. Todas las familias se miden con
+las mismas métricas sobre los mismos folds, en una sola tabla.
+
+    bt = Backtest(X_train, y_train, n_splits=5)
+    bt.run(["xgboost", "gbr", "arima"])
+    bt.summary()
+"""
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.model_selection import TimeSeriesSplit
+
+# adaptadores nombre -> fn(fold, **params) que entrena en fold y devuelve las predicciones en validación
+ADAPTERS = {}
+
+
+def register_adapter(name):
+    """Decorador para agregar una familia de modelos al backtest."""
+    def decorator(fn):
+        ADAPTERS[name] = fn
+        return fn
+    return decorator
+
+
+@dataclass
+class Fold:
+    """Partición de entrenamiento / validación de un fold, ya materializada."""
+    number: int
+    train_idx: np.ndarray
+    val_idx: np.ndarray
+    X_train: np.ndarray
+    y_train: np.ndarray
+    X_val: np.ndarray
+    y_val: np.ndarray
+    frame_train: pd.DataFrame
+    frame_val: pd.DataFrame
+    # paso de la rejilla de fechas de toda la serie (arima_model.detect_freq), el mismo en todos los folds
+    freq: object = None
+
+
+@register_adapter("xgboost")
+def _xgboost(fold, threads=1, **params):
+    import xgboost as xgb
+    params = {"n_estimators": 500, "learning_rate": 0.1, "max_depth": 3, **params}
+    model = xgb.XGBRegressor(random_state=42, tree_method="hist", n_jobs=threads, **params)
+    model.fit(fold.X_train, fold.y_train)
+    return model.predict(fold.X_val)
+
+
+@register_adapter("gbr")
+def _gbr(fold, threads=1, engine="exact", **params):
+    from gbregresor_model import _make_model
+    model = _make_model(engine).set_params(**params)
+    model.fit(fold.X_train, fold.y_train)
+    return model.predict(fold.X_val)
+
+
+@register_adapter("arima")
+def _arima(fold, threads=1, order=(9, 1, 2), freq="auto"):
+    from arima_model import SklearnLikeARIMA
+    y_train = pd.Series(fold.y_train, index=fold.frame_train.index)
+    freq = fold.freq if isinstance(freq, str) and freq == "auto" else freq
+    model = SklearnLikeARIMA(order=tuple(order)).fit(fold.frame_train, y_train, freq=freq)
+    return model.predict(fold.frame_val)
+
+
+@register_adapter("lstm")
+def _lstm(fold, threads=1, **params):
+    import torch
+    from neural import SklearnLikeLSTM
+    torch.set_num_threads(threads)
+    model = SklearnLikeLSTM(**params).fit(fold.X_train, fold.y_train)
+    return model.predict(fold.X_val)
+
+
+def _run_fold(name, fold, params, threads):
+    start = time.perf_counter()
+    y_pred = np.asarray(ADAPTERS[name](fold, threads=threads, **params), dtype="float64")
+    return y_pred, time.perf_counter() - start
+
+
+def fold_metrics(y_true, y_pred):
+    """rmse, mae, r2 y msle (predicciones negativas recortadas a 0, como los scores de arima_model)."""
+    y_true = np.asarray(y_true, dtype="float64")
+    y_pred = np.asarray(y_pred, dtype="float64")
+    errors = y_true - y_pred
+    ss_tot = np.sum((y_true - y_true.mean()) ** 2)
+    return {
+        "rmse": float(np.sqrt(np.mean(errors**2))),
+        "mae": float(np.mean(np.abs(errors))),
+        "r2": float(1 - np.sum(errors**2) / ss_tot) if ss_tot > 0 else np.nan,
+        "msle": float(np.mean((np.log1p(np.clip(y_true, 0, None)) - np.log1p(np.clip(y_pred, 0, None))) ** 2)),
+    }
+
+
+class Backtest:
+    """
+    Folds de (X, y) preparados una vez para evaluar cualquier modelo de ADAPTERS.
+
+    Las predicciones de cada (modelo, parámetros, fold) se guardan en memoria y, si se da cache_dir, en
+    disco (un .npz por fold, con clave derivada del contenido de X, y y de los folds), así que se
+    reutilizan entre corridas.
+    """
+
+    def __init__(self, X, y, n_splits=5, cache_dir=None):
+        from registry import ModelRegistry
+        self.n_splits = n_splits
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.fingerprint = ModelRegistry.key(X, y, params={"n_splits": n_splits})
+        self.index = X.index
+        self.y = np.asarray(y, dtype=np.float32)
+        values = np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+        freq = self._detect_freq(X)
+
+        self.folds = []
+        for number, (train_idx, val_idx) in enumerate(TimeSeriesSplit(n_splits=n_splits).split(values)):
+            self.folds.append(Fold(
+                number, train_idx, val_idx,
+                values[train_idx], self.y[train_idx], values[val_idx], self.y[val_idx],
+                X.iloc[train_idx], X.iloc[val_idx], freq,
+            ))
+        self.predictions = {}
+
+    @staticmethod
+    def _detect_freq(X):
+        try:
+            from arima_model import detect_freq
+            return detect_freq(X)
+        except (ImportError, TypeError, ValueError):
+            # sin statsmodels o sin columnas de fecha: ARIMA decide por fold
+            return None
+
+    @staticmethod
+    def _params_key(params):
+        return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+    def _cache_path(self, name, params_key, fold):
+        return os.path.join(self.cache_dir, f"{self.fingerprint[:16]}-{name}-{params_key}-{fold}.npz")
+
+    def _cached(self, name, params_key, fold):
+        key = (name, params_key, fold)
+        if key not in self.predictions and self.cache_dir:
+            try:
+                with np.load(self._cache_path(name, params_key, fold)) as saved:
+                    self.predictions[key] = (saved["y_pred"], float(saved["seconds"]))
+            except (OSError, KeyError, ValueError):
+                pass
+        return self.predictions.get(key)
+
+    def _store(self, name, params_key, fold, y_pred, seconds):
+        self.predictions[(name, params_key, fold)] = (y_pred, seconds)
+        if self.cache_dir:
+            path = self._cache_path(name, params_key, fold)
+            tmp = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp, y_pred=y_pred, seconds=seconds)
+            os.replace(tmp, path)
+
+    def run(self, models, params=None, n_jobs=-1, threads=1):
+        """
+        Entrena y evalúa models (nombres de ADAPTERS) en todos los folds, con params[nombre] como
+        hiperparámetros de cada uno. Los pares (modelo, fold) sin predicción guardada corren en paralelo
+        con n_jobs procesos de threads hilos cada uno. Devuelve la tabla de metrics() de esos modelos.
+        """
+        params = params or {}
+        unknown = [name for name in models if name not in ADAPTERS]
+        if unknown:
+            raise ValueError(f"unknown models {unknown}, expected some of {sorted(ADAPTERS)}")
+
+        pending = [
+            (name, self._params_key(params.get(name, {})), fold)
+            for name in models
+            for fold in self.folds
+            if self._cached(name, self._params_key(params.get(name, {})), fold.number) is None
+        ]
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(_run_fold)(name, fold, params.get(name, {}), threads) for name, _, fold in pending
+        )
+        for (name, params_key, fold), (y_pred, seconds) in zip(pending, results):
+            self._store(name, params_key, fold.number, y_pred, seconds)
+        return self.metrics(models, params)
+
+    def fold_predictions(self, name, params=None):
+        """Serie con las predicciones de validación de todos los folds (índice de X) para un modelo ya corrido."""
+        params_key = self._params_key(params or {})
+        parts = []
+        for fold in self.folds:
+            cached = self._cached(name, params_key, fold.number)
+            if cached is None:
+                raise KeyError(f"{name} con {params or {}} no se ha corrido en el fold {fold.number}")
+            parts.append(pd.Series(cached[0], index=self.index[fold.val_idx]))
+        return pd.concat(parts).rename(name)
+
+    def metrics(self, models=None, params=None):
+        """Una fila por (modelo, fold) con n_train, n_val, rmse, mae, r2, msle y fit_seconds."""
+        params = params or {}
+        models = models or sorted({name for name, _, _ in self.predictions})
+        rows = []
+        for name in models:
+            params_key = self._params_key(params.get(name, {}))
+            for fold in self.folds:
+                cached = self._cached(name, params_key, fold.number)
+                if cached is None:
+                    continue
+                y_pred, seconds = cached
+                rows.append({
+                    "model": name, "fold": fold.number,
+                    "n_train": len(fold.train_idx), "n_val": len(fold.val_idx),
+                    **fold_metrics(fold.y_val, y_pred),
+                    "fit_seconds": seconds,
+                })
+        return pd.DataFrame(rows)
+
+    def summary(self, models=None, params=None):
+        """Media y desviación por modelo de las métricas de metrics(), el mejor rmse primero."""
+        table = self.metrics(models, params)
+        if table.empty:
+            return table
+        stats = table.groupby("model")[["rmse", "mae", "r2", "msle", "fit_seconds"]].agg(["mean", "std"])
+        stats.columns = [f"{metric}_{stat}" for metric, stat in stats.columns]
+        return stats.sort_values("rmse_mean")
@@ -0,0 +1,298 @@
+"""
+Benchmarks offline de las rutas críticas sobre el cubo y catálogo sintéticos (ver benchmarks/synthetic.py).
+
+Mide, para cada tamaño: búsqueda en el catálogo (punto a punto y vectorizada), get_timeseries_at_point
+(en frío y en caliente), get_timeseries_at_points, las funciones de subcubo, el pronóstico por pixel
+(gridded), get_itslive + get_processed_data (normal y compacto), resample_observations,
+FeatureEngine.transform, los entrenadores (XGBoost, GBR, ARIMA y sus variantes), el backtest común y las
+actualizaciones incrementales (updates.update_model). Los resultados se guardan en JSON para compararlos
+contra una corrida anterior.
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import build_synthetic_dataset
+from features import FeatureEngine
+from gridded import forecast_around_point
+from its_live.datacube_tools import DATACUBETOOLS
+from utils import get_itslive, get_processed_data, resample_observations
+
+MODELS = ["xgboost", "gbr", "arima"]
+
+
+def _timeit(fn, repeat=3, setup=None):
+    """Ejecuta fn `repeat` veces (con setup() antes de cada una, fuera del tiempo) y devuelve los tiempos."""
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        # DATACUBETOOLS imprime por cada punto; no contaminar la salida ni el tiempo de terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn(*args)
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def _record(results, name, size, times, **extra):
+    entry = {
+        "bench": name,
+        "size": size,
+        "min": min(times),
+        "median": statistics.median(times),
+        "repeat": len(times),
+        **extra,
+    }
+    results.append(entry)
+    print(f"{size:>7} {name:<34} median {entry['median']:9.4f}s  min {entry['min']:9.4f}s")
+
+
+def _new_dct(data, cache_dir):
+    return DATACUBETOOLS(data["catalog"], cache_dir=cache_dir)
+
+
+def bench_datacube(data, cache_dir, repeat, results):
+    size = data["size"]
+    dct = _new_dct(data, cache_dir)
+    # catálogo ya cargado y con índice para medir solo la búsqueda
+    dct.find_datacube_catalog_entries_for_points([data["point_ll"]], "4326")
+
+    rng = np.random.default_rng(0)
+    minx, miny, maxx, maxy = data["data_xy_bounds"]
+    points_xy = np.column_stack([rng.uniform(minx, maxx, 500), rng.uniform(miny, maxy, 500)])
+    lons, lats = dct._get_transformer("3413", "4326").transform(points_xy[:, 0], points_xy[:, 1])
+    points_ll = np.column_stack([lons, lats])
+
+    _record(
+        results, "catalog_lookup_scalar", size,
+        _timeit(lambda: [dct.find_datacube_catalog_entry_for_point(list(p), "4326") for p in points_ll], repeat),
+        points=len(points_ll), features=len(dct.json_catalog["features"]),
+    )
+    _record(
+        results, "catalog_lookup_batch", size,
+        _timeit(lambda: dct.find_datacube_catalog_entries_for_points(points_ll, "4326"), repeat),
+        points=len(points_ll), features=len(dct.json_catalog["features"]),
+    )
+    _record(
+        results, "get_timeseries_at_point_cold", size,
+        _timeit(
+            lambda d: d.get_timeseries_at_point(list(data["point_ll"]), "4326", variables=["v"]),
+            repeat, setup=lambda: (_new_dct(data, cache_dir),),
+        ),
+    )
+    _record(
+        results, "get_timeseries_at_point_warm", size,
+        _timeit(lambda: dct.get_timeseries_at_point(list(data["point_ll"]), "4326", variables=["v"]), repeat),
+    )
+    _record(
+        results, "get_timeseries_at_points", size,
+        _timeit(lambda: dct.get_timeseries_at_points(points_ll[:50], "4326", variables=["v", "v_error"]), repeat),
+        points=50,
+    )
+    _record(
+        results, "get_subcube_around_point", size,
+        _timeit(
+            lambda: dct.get_subcube_around_point(
+                list(data["point_xy"]), "3413", half_distance=1200.0, variables=["v", "vx", "vy"]
+            ),
+            repeat,
+        ),
+    )
+    _record(
+        results, "gridded_forecast_around_point", size,
+        _timeit(
+            lambda: forecast_around_point(
+                dct, list(data["point_xy"]), "3413", pd.date_range("2025-01-01", "2030-12-01", freq="MS"),
+                half_distance=1200.0,
+            ),
+            repeat,
+        ),
+    )
+    _record(
+        results, "get_subcube_for_bounding_box", size,
+        _timeit(lambda: dct.get_subcube_for_bounding_box(data["bbox"], "3413", variables=["v"]), repeat),
+    )
+    return dct
+
+
+def bench_processing(data, dct, repeat, results):
+    size = data["size"]
+    lon, lat = data["point_ll"]
+    holder = {}
+
+    def fetch():
+        holder["df"] = get_itslive([(lat, lon)], dct=dct)
+
+    _record(results, "get_itslive", size, _timeit(fetch, repeat))
+    _record(results, "get_processed_data", size, _timeit(lambda: get_processed_data(holder["df"]), repeat))
+    _record(
+        results, "get_processed_data_compact", size,
+        _timeit(lambda: get_processed_data(holder["df"], compact=True), repeat),
+    )
+    glacier = get_processed_data(holder["df"], compact=True)
+    _record(results, "resample_observations", size, _timeit(lambda: resample_observations(glacier, 12), repeat))
+    # sin key: se mide el cálculo, no la caché
+    _record(results, "feature_engine_transform", size, _timeit(lambda: FeatureEngine().transform(glacier), repeat))
+    return get_processed_data(holder["df"])
+
+
+def bench_models(data, glacier, models, results):
+    size = data["size"]
+    split_idx = int(len(glacier) * 0.66)
+    X_train = glacier[["year", "month", "dayofyear"]].iloc[:split_idx]
+    y_train = glacier["v"].iloc[:split_idx]
+
+    trainers = {}
+    if "xgboost" in models:
+        from model import get_xgboost_model
+        trainers["xgboost"] = get_xgboost_model
+        trainers["xgboost_halving"] = lambda X, y: get_xgboost_model(X, y, search="halving")
+    if "gbr" in models:
+        from gbregresor_model import get_gbr_model
+        trainers["gbr"] = get_gbr_model
+        trainers["gbr_hist"] = lambda X, y: get_gbr_model(X, y, engine="hist")
+    if "arima" in models:
+        from arima_model import get_arima_model
+        trainers["arima"] = get_arima_model
+        trainers["arima_parallel"] = lambda X, y: get_arima_model(X, y, mode="parallel")
+        trainers["arima_rolling"] = lambda X, y: get_arima_model(X, y, mode="rolling")
+    if models:
+        from backtest import ADAPTERS, Backtest
+        # las mismas familias evaluadas sobre folds comunes, sin búsqueda de hiperparámetros
+        backtested = [m for m in models if m in ADAPTERS]
+        trainers["backtest"] = lambda X, y: Backtest(X, y).run(backtested)
+
+    for name, trainer in trainers.items():
+        # un solo entrenamiento: ya son decenas de ajustes internos por validación cruzada
+        try:
+            times = _timeit(lambda: trainer(X_train, y_train), 1)
+        except Exception as e:
+            # un entrenador que falla con estos datos no debe tumbar el resto de la suite
+            results.append({"bench": f"train_{name}", "size": size, "error": repr(e)})
+            print(f"{size:>7} {'train_' + name:<34} error: {e!r}")
+            continue
+        _record(results, f"train_{name}", size, times, rows=len(X_train))
+
+
+def bench_updates(data, glacier, models, results):
+    """Tiempo de update_model con el 10% de observaciones siguientes, frente a entrenar de nuevo (bench_models)."""
+    from updates import update_model
+    size = data["size"]
+    split_idx = int(len(glacier) * 0.66)
+    new_idx = split_idx + max(1, len(glacier) // 10)
+    X = glacier[["year", "month", "dayofyear"]]
+    y = glacier["v"]
+
+    base = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        if "xgboost" in models:
+            from model import get_xgboost_model
+            base["xgboost"] = lambda: get_xgboost_model(X.iloc[:split_idx], y.iloc[:split_idx], search="halving")[0]
+        if "arima" in models:
+            from arima_model import get_arima_model
+            base["arima"] = lambda: get_arima_model(X.iloc[:split_idx], y.iloc[:split_idx], mode="rolling")[0]
+        try:
+            base = {name: train() for name, train in base.items()}
+        except Exception as e:
+            results.append({"bench": "update", "size": size, "error": repr(e)})
+            print(f"{size:>7} {'update':<34} error: {e!r}")
+            return
+
+    for name, model in base.items():
+        _record(
+            results, f"update_{name}", size,
+            _timeit(lambda: update_model(model, X.iloc[split_idx:new_idx], y.iloc[split_idx:new_idx]), 3),
+            rows=new_idx - split_idx,
+        )
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold=1.2):
+    """
+    Imprime la razón contra una corrida anterior y devuelve las mediciones más lentas que threshold más
+    las que fallaron (con error) en esta corrida.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["bench"], r["size"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\ncomparación contra {baseline_path}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['size']:>7} {r['bench']:<34} error: {r['error']}  <-- falló")
+            regressions.append({**r, "baseline_median": baseline.get((r["bench"], r["size"]), {}).get("median")})
+            continue
+        base = baseline.get((r["bench"], r["size"]))
+        if base is None or "median" not in r or "median" not in base:
+            continue
+        ratio = r["median"] / base["median"] if base["median"] > 0 else float("inf")
+        flag = "  <-- más lento" if ratio > threshold else ""
+        print(f"{r['size']:>7} {r['bench']:<34} x{ratio:6.2f}{flag}")
+        if ratio > threshold:
+            regressions.append({**r, "baseline_median": base["median"], "ratio": ratio})
+    return regressions
+
+
+def run_benchmarks(
+    sizes=("small",),
+    models=MODELS,
+    repeat=3,
+    data_dir="benchmarks/data",
+    out_dir="benchmarks/results",
+    baseline=None,
+    threshold=1.2,
+):
+    """
+    Corre la suite para cada tamaño, guarda results-<fecha>.json en out_dir y compara con baseline si se da.
+    Un entrenador que falla queda registrado en el JSON y, al final, hace fallar la corrida (RuntimeError).
+    """
+    results = []
+    cache_dir = os.path.join(data_dir, "cache")
+    for size in sizes:
+        data = build_synthetic_dataset(data_dir, size)
+        dct = bench_datacube(data, cache_dir, repeat, results)
+        glacier = bench_processing(data, dct, repeat, results)
+        if models:
+            bench_models(data, glacier, models, results)
+            bench_updates(data, glacier, models, results)
+
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sizes": list(sizes),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nresultados en {out_path}")
+
+    regressions = compare(results, baseline, threshold) if baseline else []
+    errors = [r for r in results if "error" in r]
+    if errors:
+        raise RuntimeError(
+            f"{len(errors)} benchmarks fallaron: " + ", ".join(f"{r['bench']} ({r['size']})" for r in errors)
+        )
+    return out_path, regressions
@@ -0,0 +1,141 @@
+"""
+Cubo ITS_LIVE sintético (zarr local) y catálogo GeoJSON compatible para correr DATACUBETOOLS sin red.
+
+El cubo tiene la misma forma que los de ITS_LIVE: dimensiones (mid_date, y, x) en EPSG:3413 a 120 m,
+variables v, vx, vy, v_error (3D), vx_error, vy_error, date_dt, satellite_img1, mission_img1 (por fecha)
+y la variable 'mapping' con su GeoTransform. El catálogo cubre una rejilla de tiles de 100 km; solo el tile
+central apunta al cubo generado, el resto sirve para medir la búsqueda en el catálogo.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pyproj import Transformer
+
+EPSG = 3413
+RESOLUTION = 120.0
+TILE_SIZE = 100000.0
+# esquina inferior izquierda del tile central (Groenlandia occidental en EPSG:3413)
+ORIGIN = (-200000.0, -2200000.0)
+
+SIZES = {
+    "small": dict(nx=40, ny=40, nt=1000, n_tiles=10),
+    "medium": dict(nx=80, ny=80, nt=4000, n_tiles=30),
+    "large": dict(nx=100, ny=100, nt=8000, n_tiles=70),
+}
+
+
+def make_synthetic_cube(path, nx=40, ny=40, nt=1000, x0=ORIGIN[0], y0=ORIGIN[1], seed=0):
+    """Escribe en path un cubo zarr con velocidades de tendencia + estacionalidad + ruido y ~30% de huecos."""
+    rng = np.random.default_rng(seed)
+    x = x0 + RESOLUTION / 2 + RESOLUTION * np.arange(nx)
+    y = y0 + TILE_SIZE - RESOLUTION / 2 - RESOLUTION * np.arange(ny)
+
+    days = np.sort(rng.uniform(0, 10 * 365, nt))
+    mid_date = pd.Timestamp("2014-01-01") + pd.to_timedelta(days, unit="D")
+    date_dt = pd.to_timedelta(rng.integers(1, 366, nt), unit="D")
+
+    base = rng.uniform(100, 2000, (ny, nx)).astype("float32")
+    season = (1 + 0.15 * np.sin(2 * np.pi * days / 365.25) + 0.02 * days / 365.25).astype("float32")
+    v_error = rng.uniform(5, 60, (nt, ny, nx)).astype("float32")
+    v = base[None] * season[:, None, None] + rng.normal(0, 1, (nt, ny, nx)).astype("float32") * v_error
+    v[rng.random(v.shape) < 0.3] = np.nan
+    angle = rng.uniform(0, 2 * np.pi, (ny, nx)).astype("float32")
+
+    ds = xr.Dataset(
+        {
+            "v": (("mid_date", "y", "x"), v),
+            "vx": (("mid_date", "y", "x"), v * np.cos(angle)[None]),
+            "vy": (("mid_date", "y", "x"), v * np.sin(angle)[None]),
+            "v_error": (("mid_date", "y", "x"), v_error),
+            "vx_error": ("mid_date", rng.uniform(5, 60, nt).astype("float32")),
+            "vy_error": ("mid_date", rng.uniform(5, 60, nt).astype("float32")),
+            "date_dt": ("mid_date", date_dt),
+            "satellite_img1": ("mid_date", rng.choice(["1A", "1B", "2A", "2B", "7", "8", "9"], nt)),
+            "mission_img1": ("mid_date", rng.choice(["S", "L"], nt)),
+            "mapping": (
+                (),
+                0,
+                {
+                    "grid_mapping_name": "polar_stereographic",
+                    "spatial_epsg": EPSG,
+                    "GeoTransform": f"{x0} {RESOLUTION} 0 {y0 + TILE_SIZE} 0 {-RESOLUTION}",
+                },
+            ),
+        },
+        coords={"mid_date": mid_date, "x": x, "y": y},
+    )
+    # misma forma de chunks que los cubos de ITS_LIVE: serie completa por bloques de 10x10 pixeles
+    encoding = {
+        name: {"chunks": (nt, min(10, ny), min(10, nx))} for name in ["v", "vx", "vy", "v_error"]
+    }
+    ds.to_zarr(path, mode="w", encoding=encoding, consolidated=True, zarr_format=2)
+    return ds
+
+
+def make_synthetic_catalog(path, cube_path, n_tiles=10):
+    """Catálogo GeoJSON de n_tiles x n_tiles tiles alrededor de ORIGIN; el tile central apunta a cube_path."""
+    to_ll = Transformer.from_crs(EPSG, 4326, always_xy=True)
+    half = n_tiles // 2
+    features = []
+    for i in range(-half, n_tiles - half):
+        for j in range(-half, n_tiles - half):
+            tx, ty = ORIGIN[0] + i * TILE_SIZE, ORIGIN[1] + j * TILE_SIZE
+            ring = [[tx, ty], [tx + TILE_SIZE, ty], [tx + TILE_SIZE, ty + TILE_SIZE], [tx, ty + TILE_SIZE], [tx, ty]]
+            # bordes densificados para que el polígono lon,lat siga la curvatura del tile
+            edge = np.linspace(0, 1, 9)[:-1]
+            dense = np.concatenate(
+                [np.array(a) + np.outer(edge, np.subtract(b, a)) for a, b in zip(ring[:-1], ring[1:])]
+            )
+            lons, lats = to_ll.transform(dense[:, 0], dense[:, 1])
+            ll_ring = np.column_stack([lons, lats]).tolist()
+            ll_ring.append(ll_ring[0])
+            url = cube_path if (i, j) == (0, 0) else os.path.join(os.path.dirname(cube_path), f"missing_{i}_{j}.zarr")
+            features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Polygon", "coordinates": [ll_ring]},
+                    "properties": {
+                        "epsg": EPSG,
+                        "data_epsg": f"EPSG:{EPSG}",
+                        "geometry_epsg": {"type": "Polygon", "coordinates": [ring]},
+                        "zarr_url": url,
+                    },
+                }
+            )
+    with open(path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
+def build_synthetic_dataset(root, size="small", seed=0):
+    """
+    Genera (o reutiliza) cubo y catálogo para un tamaño de SIZES en root/size y devuelve sus rutas
+    junto con un punto (lon, lat) y un bbox (EPSG:3413) dentro del área con datos.
+    """
+    params = SIZES[size]
+    out = os.path.join(root, size)
+    os.makedirs(out, exist_ok=True)
+    cube_path = os.path.join(out, "cube.zarr")
+    catalog_path = os.path.join(out, "catalog.json")
+    if not os.path.exists(os.path.join(cube_path, ".zmetadata")):
+        make_synthetic_cube(cube_path, params["nx"], params["ny"], params["nt"], seed=seed)
+    if not os.path.exists(catalog_path):
+        make_synthetic_catalog(catalog_path, cube_path, params["n_tiles"])
+
+    width = RESOLUTION * params["nx"]
+    height = RESOLUTION * params["ny"]
+    top = ORIGIN[1] + TILE_SIZE
+    center_xy = (ORIGIN[0] + width / 2, top - height / 2)
+    to_ll = Transformer.from_crs(EPSG, 4326, always_xy=True)
+    return {
+        "size": size,
+        "cube": cube_path,
+        "catalog": catalog_path,
+        "point_ll": to_ll.transform(*center_xy),
+        "point_xy": center_xy,
+        "bbox": [ORIGIN[0] + width / 4, top - 3 * height / 4, ORIGIN[0] + 3 * width / 4, top - height / 4],
+        "data_xy_bounds": (ORIGIN[0], top - height, ORIGIN[0] + width, top),
+        **params,
+    }
@@ -0,0 +1,153 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DAY_NS = 86400 * 10**9
+
+
+def _days(index):
+    """Fechas de un DatetimeIndex (con o sin zona, cualquier unidad) como días flotantes desde 1970 en UTC."""
+    return pd.DatetimeIndex(index).values.astype("datetime64[ns]").astype("int64") / DAY_NS
+
+
+def calendar_features(index):
+    """year, month y dayofyear de un DatetimeIndex, como en get_processed_data y get_future_dates."""
+    index = pd.DatetimeIndex(index)
+    return {
+        "year": index.year.to_numpy(),
+        "month": index.month.to_numpy(),
+        "dayofyear": index.dayofyear.to_numpy(),
+    }
+
+
+class FeatureEngine:
+    """
+    Variables para los modelos de árboles a partir de la serie procesada (get_processed_data o
+    resample_observations): calendario, armónicos estacionales, lags y ventanas móviles de v.
+
+    Los lags y ventanas se miden en días, no en filas, así que sirven igual para las observaciones
+    irregulares de ITS_LIVE que para series agrupadas:
+    - lag_<d>d: última observación en o antes de t - d días
+    - roll_mean_<w>d / roll_std_<w>d: media y desviación de las observaciones en (t - m - w, t - m],
+        con m = el lag más corto; si la ventana está vacía se usan el último valor conocido y 0
+    - sin_<k> / cos_<k>: armónicos de periodo period_days / k
+
+    Todas las variables de una serie se calculan en una pasada con np.searchsorted y sumas acumuladas.
+    Como ninguna depende de valores a menos de m días, forecast() genera el horizonte en bloques de
+    m días: cada bloque es una sola llamada a model.predict y sus predicciones alimentan los siguientes.
+    transform() guarda el resultado por punto (key) y lo reutiliza mientras la serie no cambie.
+    """
+
+    def __init__(self, lags=(30, 60, 90, 180, 365), windows=(30, 90, 365), harmonics=2,
+                 period_days=365.25, target="v", max_cached=64):
+        if not lags or min(lags) <= 0:
+            raise ValueError("lags must be a non-empty list of positive day counts")
+        self.lags = tuple(sorted(lags))
+        self.windows = tuple(windows)
+        self.harmonics = harmonics
+        self.period_days = period_days
+        self.target = target
+        self.min_lag = self.lags[0]
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self.columns = (
+            ["year", "month", "dayofyear"]
+            + [f"{fn}_{k}" for k in range(1, harmonics + 1) for fn in ("sin", "cos")]
+            + [f"lag_{d}d" for d in self.lags]
+            + [f"roll_{stat}_{w}d" for w in self.windows for stat in ("mean", "std")]
+        )
+
+    def _history(self, series):
+        """Tiempos (días) ordenados y valores sin NaN de la serie objetivo."""
+        times = _days(series.index)
+        values = series.to_numpy(dtype="float64")
+        valid = ~np.isnan(values)
+        order = np.argsort(times[valid], kind="stable")
+        return times[valid][order], values[valid][order]
+
+    def _features(self, index, hist_times, hist_values):
+        """Matriz de variables para las fechas de index dada la historia (tiempos ordenados, valores)."""
+        t = _days(index)
+        out = calendar_features(index)
+
+        phase = 2 * np.pi * t[:, None] * np.arange(1, self.harmonics + 1) / self.period_days
+        for k in range(self.harmonics):
+            out[f"sin_{k + 1}"] = np.sin(phase[:, k])
+            out[f"cos_{k + 1}"] = np.cos(phase[:, k])
+
+        padded = np.concatenate([[np.nan], hist_values])
+        for d in self.lags:
+            # posición (+1) de la última observación en o antes de t - d; 0 -> sin historia -> NaN
+            out[f"lag_{d}d"] = padded[np.searchsorted(hist_times, t - d, side="right")]
+
+        csum = np.concatenate([[0.0], np.cumsum(hist_values)])
+        csum2 = np.concatenate([[0.0], np.cumsum(hist_values**2)])
+        hi = np.searchsorted(hist_times, t - self.min_lag, side="right")
+        last = padded[hi]
+        for w in self.windows:
+            lo = np.searchsorted(hist_times, t - self.min_lag - w, side="right")
+            n = hi - lo
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean = (csum[hi] - csum[lo]) / n
+                std = np.sqrt(np.maximum((csum2[hi] - csum2[lo]) / n - mean**2, 0.0))
+            out[f"roll_mean_{w}d"] = np.where(n > 0, mean, last)
+            out[f"roll_std_{w}d"] = np.where(n > 0, std, 0.0)
+
+        return pd.DataFrame(out, index=index)[self.columns]
+
+    @staticmethod
+    def _fingerprint(series):
+        digest = hashlib.sha1(_days(series.index).tobytes())
+        digest.update(series.to_numpy(dtype="float64").tobytes())
+        return digest.hexdigest()
+
+    def transform(self, glacier, key=None):
+        """
+        Variables para cada fila de glacier (índice de fechas, columna target). Con key (p. ej. (lat, lon))
+        el resultado se guarda y se devuelve sin recalcular mientras la serie sea la misma.
+        Las primeras filas quedan con NaN en los lags que todavía no tienen historia.
+        """
+        series = glacier[self.target]
+        if key is not None:
+            fingerprint = self._fingerprint(series)
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                self._cache.move_to_end(key)
+                return cached[1]
+        features = self._features(glacier.index, *self._history(series))
+        if key is not None:
+            self._cache[key] = (fingerprint, features)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return features
+
+    def forecast(self, model, glacier, dates):
+        """
+        Predicciones de model (entrenado con transform) para las fechas futuras dates, alimentando los lags
+        con las propias predicciones. Se llama a model.predict una vez por bloque de min_lag días.
+        """
+        dates = pd.DatetimeIndex(dates)
+        order = np.argsort(_days(dates), kind="stable")
+        t = _days(dates)[order]
+        hist_times, hist_values = self._history(glacier[self.target])
+        pred = np.empty(len(t))
+
+        start = 0
+        while start < len(t):
+            # todas las fechas de este bloque solo dependen de valores anteriores a t[start]
+            stop = np.searchsorted(t, t[start] + self.min_lag, side="left")
+            block = dates[order[start:stop]]
+            pred[start:stop] = model.predict(self._features(block, hist_times, hist_values))
+            hist_times = np.concatenate([hist_times, t[start:stop]])
+            hist_values = np.concatenate([hist_values, pred[start:stop]])
+            start = stop
+
+        out = np.empty(len(t))
+        out[order] = pred
+        return out
+
+    def clear_cache(self):
+        self._cache.clear()
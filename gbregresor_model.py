@@ -1,22 +1,50 @@
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.model_selection import cross_val_score
-from sklearn.metrics import mean_squared_log_error
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.metrics import get_scorer
+from sklearn.base import clone
+from joblib import Parallel, delayed
 import numpy as np
 
-def get_gbr_model(X_train, y_train):
+def _make_model(engine):
+    if engine == "exact":
+        return GradientBoostingRegressor(random_state=42)
+    if engine == "hist":
+        # parada temprana con una fracción de validación: deja de agregar árboles cuando no mejora
+        return HistGradientBoostingRegressor(
+            max_depth=3,
+            max_iter=500,
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
+            random_state=42,
+        )
+    raise ValueError(f"engine must be 'exact' or 'hist', got {engine!r}")
+
+def _fit_and_score(model, X, y, train_idx, val_idx, scorer):
+    """Entrena una copia de model en train_idx; devuelve el score en val_idx o el modelo si val_idx es None."""
+    model = clone(model).fit(X.iloc[train_idx], y.iloc[train_idx])
+    if val_idx is None:
+        return model
+    return scorer(model, X.iloc[val_idx], y.iloc[val_idx])
+
+def get_gbr_model(X_train, y_train, engine="exact", n_jobs=-1, n_splits=10):
     """
-    Entrena un modelo Gradient Boosting Regressor con validación cruzada.
+    Entrena un modelo Gradient Boosting Regressor con validación cruzada sobre todas las columnas
+    de X_train (year, month, dayofyear o las de features.FeatureEngine).
+    engine="exact" usa GradientBoostingRegressor; engine="hist" usa HistGradientBoostingRegressor
+    (histogramas y parada temprana), mucho más rápido en puntos con muchas observaciones.
+    Los folds (TimeSeriesSplit, respetan el orden temporal) y el ajuste final corren en paralelo
+    con n_jobs procesos.
     Devuelve el modelo entrenado y los scores.
     """
-    model = GradientBoostingRegressor(random_state=42)
-    
-    scores = cross_val_score(
-        model,
-        X_train[['year', 'month', 'dayofyear']],
-        y_train,
-        cv=10,
-        scoring='neg_mean_squared_log_error'
+    model = _make_model(engine)
+    scorer = get_scorer('neg_mean_squared_log_error')
+    folds = list(TimeSeriesSplit(n_splits=n_splits).split(X_train))
+    all_idx = np.arange(len(X_train))
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_and_score)(model, X_train, y_train, train_idx, val_idx, scorer)
+        for train_idx, val_idx in folds + [(all_idx, None)]
     )
-    
-    model.fit(X_train[['year', 'month', 'dayofyear']], y_train)
-    return model, scores
+    scores = np.array(results[:-1])
+    return results[-1], scores
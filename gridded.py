@@ -0,0 +1,165 @@
+"""
+Pronóstico por pixel de un subcubo completo: tendencia lineal + armónicos estacionales ajustados por
+mínimos cuadrados ponderados para todos los pixeles a la vez.
+
+Para cada pixel se resuelve v(t) ≈ a + b·(t - t0) + Σ_k [c_k·sin(2πkt/P) + d_k·cos(2πkt/P)] con pesos
+1 / v_error² sobre sus observaciones válidas. Como cada pixel tiene huecos distintos, las ecuaciones
+normales (p x p, con p = 2 + 2·harmonics) se arman para todos los pixeles de un bloque con un einsum y
+se resuelven con un solo np.linalg.solve por lotes. El subcubo se recorre tile por tile
+(DATACUBETOOLS.iter_subcube_*), así que la memoria depende del tamaño del tile, no del área.
+"""
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from features import _days
+
+DAYS_PER_YEAR = 365.25
+
+
+def design_matrix(days, t0, harmonics=2, period_days=DAYS_PER_YEAR):
+    """Columnas [1, años desde t0, sin_1, cos_1, ..., sin_k, cos_k] para tiempos en días."""
+    days = np.asarray(days, dtype="float64")
+    phase = 2 * np.pi * days[:, None] * np.arange(1, harmonics + 1) / period_days
+    columns = [np.ones_like(days), (days - t0) / DAYS_PER_YEAR]
+    for k in range(harmonics):
+        columns += [np.sin(phase[:, k]), np.cos(phase[:, k])]
+    return np.column_stack(columns)
+
+
+def fit_pixels(X, values, weights=None, min_obs=10, ridge=1e-10):
+    """
+    Mínimos cuadrados ponderados por lotes.
+    X: (n_t, p) diseño común; values: (n_t, n_pix) con NaN donde no hay dato; weights: (n_t, n_pix) o None.
+    Devuelve coeficientes (n_pix, p) (NaN si el pixel tiene menos de min_obs observaciones),
+    número de observaciones (n_pix,) y RMSE ponderado de los residuos (n_pix,).
+    """
+    valid = ~np.isnan(values)
+    w = valid.astype("float64") if weights is None else np.where(valid & np.isfinite(weights), weights, 0.0)
+    y = np.where(valid, values, 0.0)
+
+    gram = np.einsum("tp,tq,tn->npq", X, X, w)
+    rhs = np.einsum("tp,tn->np", X, w * y)
+    # regularización mínima relativa a la escala de cada pixel para que los casi singulares no exploten
+    scale = np.trace(gram, axis1=1, axis2=2)[:, None, None] / X.shape[1]
+    gram += ridge * np.maximum(scale, 1e-12) * np.eye(X.shape[1])
+
+    n_obs = valid.sum(axis=0)
+    coef = np.full((values.shape[1], X.shape[1]), np.nan)
+    enough = n_obs >= max(min_obs, X.shape[1])
+    if enough.any():
+        coef[enough] = np.linalg.solve(gram[enough], rhs[enough][..., None])[..., 0]
+
+    residuals = y - X @ np.nan_to_num(coef).T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rmse = np.sqrt((w * residuals**2).sum(axis=0) / w.sum(axis=0))
+    rmse[~enough] = np.nan
+    return coef, n_obs, rmse
+
+
+def _mapping_for(ds, mapping):
+    """copia de mapping con el GeoTransform de las coordenadas x, y de ds (esquina superior izquierda)"""
+    mapping = mapping.copy(deep=True)
+    gt = [float(v) for v in mapping.attrs["GeoTransform"].split()]
+    x0 = float(ds.x.min()) - gt[1] / 2.0
+    y0 = float(ds.y.max()) - gt[5] / 2.0
+    mapping.attrs["GeoTransform"] = " ".join(str(v) for v in [x0, gt[1], gt[2], y0, gt[4], gt[5]])
+    return mapping
+
+
+def forecast_tile(tile, dates, variable="v", error_variable="v_error", harmonics=2, min_obs=10,
+                  min_dt=None, max_dt=None, t0=None, max_pixels=20000):
+    """
+    Ajusta todos los pixeles de un tile (Dataset con dims mid_date, y, x) y evalúa el modelo en dates.
+    min_dt / max_dt (días) filtran por date_dt como get_processed_data si el tile la trae.
+    Los pixeles se procesan en bloques de max_pixels para acotar las matrices p x p por pixel.
+    """
+    dates = pd.DatetimeIndex(dates)
+    dates = dates.tz_convert(None) if dates.tz is not None else dates
+    values = tile[variable].transpose("mid_date", "y", "x")
+    days = _days(tile["mid_date"].values)
+    keep = np.ones(len(days), dtype=bool)
+    if (min_dt is not None or max_dt is not None) and "date_dt" in tile:
+        dt = tile["date_dt"].values
+        dt = dt / np.timedelta64(1, "D") if np.issubdtype(dt.dtype, np.timedelta64) else dt.astype("float64")
+        if min_dt is not None:
+            keep &= dt >= min_dt
+        if max_dt is not None:
+            keep &= dt <= max_dt
+
+    # se ajusta con el tiempo centrado en las observaciones (bien condicionado) y luego se pasa a t0
+    center = days[keep].mean() if keep.any() else 0.0
+    t0 = center if t0 is None else t0
+    X = design_matrix(days[keep], center, harmonics)
+    ny, nx = values.sizes["y"], values.sizes["x"]
+    v = values.values[keep].reshape(keep.sum(), ny * nx).astype("float64")
+    w = None
+    if error_variable is not None and error_variable in tile:
+        err = tile[error_variable]
+        err = err.transpose("mid_date", "y", "x").values[keep].reshape(keep.sum(), ny * nx) if err.ndim == 3 \
+            else np.repeat(err.values[keep][:, None], ny * nx, axis=1)
+        with np.errstate(divide="ignore"):
+            w = 1.0 / err.astype("float64") ** 2
+
+    coef = np.full((ny * nx, X.shape[1]), np.nan)
+    n_obs = np.zeros(ny * nx, dtype="int64")
+    rmse = np.full(ny * nx, np.nan)
+    for start in range(0, ny * nx, max_pixels):
+        block = slice(start, start + max_pixels)
+        coef[block], n_obs[block], rmse[block] = fit_pixels(
+            X, v[:, block], None if w is None else w[:, block], min_obs=min_obs
+        )
+
+    coef[:, 0] -= coef[:, 1] * (center - t0) / DAYS_PER_YEAR
+    future = design_matrix(_days(dates), t0, harmonics) @ coef.T
+    grid = dict(y=tile.y, x=tile.x)
+    out = xr.Dataset(
+        {
+            variable: (("mid_date", "y", "x"), future.reshape(len(dates), ny, nx).astype("float32")),
+            "intercept": (("y", "x"), coef[:, 0].reshape(ny, nx)),
+            "trend": (("y", "x"), coef[:, 1].reshape(ny, nx)),
+            "n_obs": (("y", "x"), n_obs.reshape(ny, nx)),
+            "rmse": (("y", "x"), rmse.reshape(ny, nx)),
+        },
+        coords={"mid_date": dates, **grid},
+    )
+    if harmonics:
+        out["seasonal_amplitude"] = (("y", "x"), np.hypot(coef[:, 2], coef[:, 3]).reshape(ny, nx))
+    out[variable].attrs.update(units=tile[variable].attrs.get("units", "m/y"), description="trend + harmonic forecast")
+    out["trend"].attrs.update(description=f"linear trend of {variable} per year")
+    return out
+
+
+def forecast_subcube(tiles, dates, variable="v", error_variable="v_error", harmonics=2, min_obs=10,
+                     min_dt=None, max_dt=None, t0=None):
+    """
+    Cubo de pronóstico (mid_date = dates, y, x) más coeficientes por pixel para un subcubo dado como
+    Dataset o como iterable de tiles (p. ej. DATACUBETOOLS.iter_subcube_around_point(..., by="space")).
+    Con t0 (días desde 1970) la tendencia de todos los tiles comparte origen; por defecto se usa 2000-01-01.
+    """
+    if isinstance(tiles, xr.Dataset):
+        tiles = [tiles]
+    t0 = _days(pd.DatetimeIndex(["2000-01-01"]))[0] if t0 is None else t0
+    pieces = []
+    mapping = None
+    for tile in tiles:
+        pieces.append(forecast_tile(tile, dates, variable, error_variable, harmonics, min_obs, min_dt, max_dt, t0))
+        if mapping is None and "mapping" in tile:
+            mapping = tile["mapping"]
+    if not pieces:
+        return None
+    out = xr.combine_by_coords(pieces) if len(pieces) > 1 else pieces[0]
+    out = out.sortby("y", ascending=False).sortby("x")
+    if mapping is not None:
+        out["mapping"] = _mapping_for(out, mapping)
+    return out
+
+
+def forecast_around_point(dct, point_xy, point_epsg_str, dates, half_distance=5000.0, tile_size=None, **kwargs):
+    """forecast_subcube del subcubo alrededor de un punto, leído tile por tile con dct (DATACUBETOOLS)"""
+    variables = ["v", "v_error", "date_dt"] if kwargs.get("min_dt") is not None or kwargs.get("max_dt") is not None \
+        else ["v", "v_error"]
+    tiles = dct.iter_subcube_around_point(
+        point_xy, point_epsg_str, half_distance=half_distance, variables=variables, by="space", tile_size=tile_size
+    )
+    return forecast_subcube(tiles, dates, **kwargs)
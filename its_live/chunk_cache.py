@@ -0,0 +1,248 @@
+# persistent, size-bounded local cache for zarr datacube chunks
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from zarr.core.buffer import default_buffer_prototype
+from zarr.storage import WrapperStore
+
+# zarr metadata documents are never cached so that updated cubes are always seen with their current layout
+METADATA_KEYS = {".zmetadata", ".zarray", ".zattrs", ".zgroup", "zarr.json"}
+# array metadata document per zarr format, its hash versions the cached chunks of the array
+ARRAY_METADATA_KEYS = (".zarray", "zarr.json")
+
+
+class ChunkCache:
+    """
+    least-recently-used cache of zarr chunk objects in a local directory, shared by all cubes read through it
+
+    - one sub-directory per store URL (sha1 of the URL), chunk keys are stored as relative paths below it
+    - total size is kept under max_bytes by evicting the least recently read chunks; recency survives
+        restarts because file modification times are refreshed on every hit
+    - pinned cubes (pin(url)) are never evicted, so hot glaciers stay local
+    - hits, misses and evictions are counted, see stats()
+    """
+
+    PINS_FILE = "pins.json"
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # relative path -> size in bytes, least recently used first
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._pinned = self._read_pins()
+        self._scan()
+
+    @staticmethod
+    def store_id(store_url):
+        """directory name used for a store URL"""
+        return hashlib.sha1(store_url.rstrip("/").encode()).hexdigest()[:16]
+
+    def _read_pins(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.PINS_FILE)) as inpins:
+                return set(json.load(inpins))
+        except (OSError, ValueError):
+            return set()
+
+    def _write_pins(self):
+        with open(os.path.join(self.cache_dir, self.PINS_FILE), "w") as outpins:
+            json.dump(sorted(self._pinned), outpins)
+
+    def _scan(self):
+        """rebuild the LRU order from the files already on disk (oldest modification time first)"""
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name == self.PINS_FILE or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                found.append((st.st_mtime, os.path.relpath(path, self.cache_dir), st.st_size))
+        for _, relpath, size in sorted(found):
+            self._entries[relpath] = size
+            self._total_bytes += size
+
+    def _relpath(self, store_url, key):
+        return os.path.join(self.store_id(store_url), *key.split("/"))
+
+    def get(self, store_url, key):
+        """cached bytes for key of the store at store_url, or None (counted as a miss)"""
+        relpath = self._relpath(store_url, key)
+        with self._lock:
+            if relpath not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(relpath)
+            self.hits += 1
+        path = os.path.join(self.cache_dir, relpath)
+        try:
+            with open(path, "rb") as inchunk:
+                data = inchunk.read()
+            os.utime(path)
+        except OSError:
+            # removed behind our back (another process evicted it) - treat as a miss
+            with self._lock:
+                self._total_bytes -= self._entries.pop(relpath, 0)
+                self.hits -= 1
+                self.misses += 1
+            return None
+        return data
+
+    def put(self, store_url, key, data):
+        """store bytes for key of the store at store_url, then evict down to max_bytes"""
+        relpath = self._relpath(store_url, key)
+        path = os.path.join(self.cache_dir, relpath)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as outchunk:
+                outchunk.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"could not cache chunk {key} of {store_url}: {e}")
+            return
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(relpath, 0)
+            self._entries[relpath] = len(data)
+            self._evict()
+
+    def _evict(self):
+        """drop least recently used unpinned chunks until the cache fits in max_bytes (lock held)"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        for relpath in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if relpath.split(os.sep, 1)[0] in self._pinned:
+                continue
+            size = self._entries.pop(relpath)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.cache_dir, relpath))
+            except OSError:
+                pass
+
+    def pin(self, store_url):
+        """never evict chunks of the cube at store_url"""
+        with self._lock:
+            self._pinned.add(self.store_id(store_url))
+            self._write_pins()
+
+    def unpin(self, store_url):
+        with self._lock:
+            self._pinned.discard(self.store_id(store_url))
+            self._write_pins()
+            self._evict()
+
+    def is_pinned(self, store_url):
+        return self.store_id(store_url) in self._pinned
+
+    def clear(self):
+        """remove every cached chunk (pins are kept)"""
+        with self._lock:
+            for relpath in self._entries:
+                try:
+                    os.remove(os.path.join(self.cache_dir, relpath))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "pinned": len(self._pinned),
+            }
+
+
+class CachingStore(WrapperStore):
+    """
+    read-through zarr store: whole-object reads of chunk keys are served from a ChunkCache when present
+    and written to it after being fetched from the wrapped store (S3, local directory, ...)
+    hits and misses are also counted in instrumentation (an its_live.instrumentation.Instrumentation) if given
+
+    cached chunks are keyed by a hash of their array's metadata document (.zarray / zarr.json, read once per
+    store): when ITS_LIVE appends mid_dates the array shape changes, so the rewritten chunks are fetched again
+    instead of served stale (the old versions are evicted as least recently used); chunks of arrays without a
+    readable metadata document are not cached
+    """
+
+    def __init__(self, store, cache, store_url, instrumentation=None):
+        super().__init__(store)
+        self._cache = cache
+        self._store_url = store_url
+        self._instrumentation = instrumentation
+        # array path -> metadata version (None when the path is not an array)
+        self._versions = {}
+
+    def _with_store(self, store):
+        return type(self)(store, self._cache, self._store_url, self._instrumentation)
+
+    def _count(self, name):
+        if self._instrumentation is not None:
+            self._instrumentation.count(name)
+
+    def __repr__(self):
+        return f"CachingStore({self._store.__class__.__name__}, '{self._store}')"
+
+    async def _array_version(self, path):
+        if path not in self._versions:
+            version = None
+            for name in ARRAY_METADATA_KEYS:
+                buf = await self._store.get(f"{path}/{name}", default_buffer_prototype())
+                if buf is not None:
+                    version = hashlib.sha1(buf.to_bytes()).hexdigest()[:12]
+                    break
+            self._versions[path] = version
+        return self._versions[path]
+
+    async def _cache_key(self, key):
+        """key of a chunk in the ChunkCache: <array>@<metadata version>/<chunk>, None if not cacheable"""
+        parts = key.split("/")
+        # the array is the first prefix with an array metadata document (v2 "v/0.0.0", v3 "v/c/0/0/0",
+        # or below groups); arrays do not nest, so shorter prefixes are tried first
+        for i in range(1, len(parts)):
+            path = "/".join(parts[:i])
+            version = await self._array_version(path)
+            if version is not None:
+                return f"{path}@{version}/{'/'.join(parts[i:])}"
+        return None
+
+    async def get(self, key, prototype, byte_range=None):
+        if byte_range is not None or key.rsplit("/", 1)[-1] in METADATA_KEYS:
+            return await self._store.get(key, prototype, byte_range)
+        cache_key = await self._cache_key(key)
+        if cache_key is None:
+            return await self._store.get(key, prototype)
+        data = self._cache.get(self._store_url, cache_key)
+        if data is not None:
+            self._count("chunk_cache.hits")
+            return prototype.buffer.from_bytes(data)
+        self._count("chunk_cache.misses")
+        buf = await self._store.get(key, prototype)
+        if buf is not None:
+            self._cache.put(self._store_url, cache_key, buf.to_bytes())
+        return buf
+
+    async def get_partial_values(self, prototype, key_ranges):
+        return await asyncio.gather(
+            *[self.get(key, prototype, byte_range) for key, byte_range in key_ranges]
+        )
@@ -0,0 +1,143 @@
+# bounded pool of open (lazy) xarray datacubes
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def estimate_cube_nbytes(ds):
+    """approximate memory held by an open lazy cube: its in-memory index coordinates plus attributes"""
+    nbytes = sum(ds[name].nbytes for name in ds.indexes)
+    nbytes += len(json.dumps(ds.attrs, default=str))
+    nbytes += sum(len(json.dumps(ds[name].attrs, default=str)) for name in ds.variables)
+    return nbytes
+
+
+class CubePool:
+    """
+    least-recently-used pool of open datacubes keyed by URL, a bounded and thread-safe replacement for a dict
+    of open cubes
+
+    - at most max_entries cubes and about max_bytes of coordinate vectors/attributes are kept open; the least
+        recently used cube is dropped when either limit is exceeded (the cube just opened is always kept)
+    - single-flight opening: threads asking for a URL that is being opened wait for that open instead of
+        opening the cube again
+    - hits, opens, shared (waited on another thread's open) and evictions are counted, see stats()
+
+    opener(url) opens a cube and returns the xarray Dataset
+    """
+
+    def __init__(self, opener, max_entries=16, max_bytes=512 * 1024**2):
+        self.opener = opener
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.opens = 0
+        self.shared = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # url -> (dataset, nbytes), least recently used first
+        self._cubes = OrderedDict()
+        self._total_bytes = 0
+        # url -> Future of an open in progress
+        self._pending = {}
+
+    def get(self, url):
+        """open cube for url, opening it (once, even with concurrent callers) if it is not in the pool"""
+        with self._lock:
+            if url in self._cubes:
+                self._cubes.move_to_end(url)
+                self.hits += 1
+                return self._cubes[url][0]
+            pending = self._pending.get(url)
+            leader = pending is None
+            if leader:
+                pending = self._pending[url] = Future()
+
+        if not leader:
+            ds = pending.result()
+            with self._lock:
+                self.shared += 1
+            return ds
+
+        try:
+            ds = self.opener(url)
+            nbytes = estimate_cube_nbytes(ds)
+            with self._lock:
+                self.opens += 1
+                self._cubes[url] = (ds, nbytes)
+                self._total_bytes += nbytes
+                evicted = self._evict()
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            # waiters already hold the Future; later callers must not find a stale one
+            with self._lock:
+                self._pending.pop(url, None)
+        pending.set_result(ds)
+        for evicted_url in evicted:
+            logging.info(f"dropping datacube {evicted_url} from pool")
+        return ds
+
+    def _evict(self):
+        """pop least recently used cubes beyond the limits (lock held), returns their urls
+
+        evicted cubes are not closed: another thread may still be reading one (e.g. a mosaic touching more
+        than max_entries cubes), it is released by the garbage collector once nobody holds it
+        """
+        evicted = []
+        while len(self._cubes) > 1 and (
+            len(self._cubes) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            url, (ds, nbytes) = self._cubes.popitem(last=False)
+            self._total_bytes -= nbytes
+            self.evictions += 1
+            evicted.append(url)
+        return evicted
+
+    def discard(self, url):
+        """drop one cube from the pool (the next get reopens it); like eviction it is left to the GC"""
+        with self._lock:
+            entry = self._cubes.pop(url, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+
+    def close(self):
+        """close every open cube"""
+        with self._lock:
+            entries = list(self._cubes.values())
+            self._cubes.clear()
+            self._total_bytes = 0
+        for ds, _ in entries:
+            ds.close()
+
+    def __contains__(self, url):
+        with self._lock:
+            return url in self._cubes
+
+    def __getitem__(self, url):
+        with self._lock:
+            return self._cubes[url][0]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cubes)
+
+    def keys(self):
+        with self._lock:
+            return list(self._cubes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "opens": self.opens,
+                "shared": self.shared,
+                "evictions": self.evictions,
+                "entries": len(self._cubes),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
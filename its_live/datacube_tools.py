@@ -1,20 +1,36 @@
 # to get and use geojson datacube catalog
+import hashlib
 import json
 import logging
+import os
+import pickle
+import threading
 # for timing data access
 import time
+from concurrent.futures import ThreadPoolExecutor
 
+import fsspec
 import numpy as np
-import pyproj
+import pandas as pd
 import s3fs as s3
+import shapely
 # for datacube xarray/zarr access
 import xarray as xr
-from pyproj import Transformer
+import zarr
+from pyproj import CRS, Transformer
 # for plotting time series
 from shapely import geometry
 
+from its_live.chunk_cache import CachingStore
+from its_live.cube_pool import CubePool
+from its_live.instrumentation import Instrumentation, InstrumentedStore, instrumented
+
 logging.basicConfig(level=logging.ERROR)
-# import pandas as pd
+
+# local cache for the parsed datacube catalog (and its spatial index), override with ITS_LIVE_CACHE_DIR
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "its_live")
+# seconds a cached catalog is used without checking the remote copy for changes
+CATALOG_TTL = 24 * 3600
 
 
 # class to throw time series lookup errors
@@ -31,32 +47,213 @@ class DATACUBETOOLS:
     (<a href="https://its-live.jpl.nasa.gov">ITS_LIVE</a>) with funding provided by NASA MEaSUREs.\n
     """
 
-    def __init__(self, use_catalog="all"):
+    def __init__(
+        self,
+        use_catalog="all",
+        cache_dir=None,
+        catalog_ttl=CATALOG_TTL,
+        storage_options=None,
+        chunk_cache=None,
+        max_open_cubes=16,
+        max_open_cube_bytes=512 * 1024**2,
+        instrumentation=None,
+    ):
         """
         tools for accessing ITS_LIVE glacier velocity datacubes in S3
-        __init__ reads in the geojson catalog of datacubes and creates list .open_cubes
+        construction does no I/O: the geojson catalog of datacubes, the elevation dataset and the
+        transformers are loaded on first use. The parsed catalog and its spatial index are kept in
+        cache_dir (default ITS_LIVE_CACHE_DIR or ~/.cache/its_live) and reused for catalog_ttl seconds,
+        after which the remote catalog's ETag/modification time is checked before downloading it again
+
+        use_catalog is a key of .catalog or the URL/path of a catalog GeoJSON file
+        storage_options are the fsspec/s3fs options for remote catalogs and cubes (default anonymous S3), e.g.
+            {"anon": True, "client_kwargs": {"endpoint_url": "http://localhost:9000"}} for a local S3 stand-in
+        chunk_cache is an optional its_live.chunk_cache.ChunkCache that keeps datacube chunks on local disk
+        max_open_cubes / max_open_cube_bytes bound the .open_cubes pool (least recently used cubes are dropped)
+        instrumentation is an its_live.instrumentation.Instrumentation collecting timing spans (catalog_lookup,
+            reproject, cube_open, load, ...) and I/O counters (remote.bytes, chunks.gets, chunk_cache.hits, ...);
+            a new one is created by default, see instrumentation_report()
         """
         # the URL for the current datacube catalog GeoJSON file - set up as dictionary to allow other catalogs for testing
         self.catalog = {
             "all": "s3://its-live-data/datacubes/catalog_v02.json",
         }
 
-        self.transformer_3031 = Transformer.from_crs(4326, 3031, always_xy=True)
-
-        self.elevation_dataset = xr.open_dataset(
-            "s3://its-live-data/height_change/Antarctica/Grounded/ANT_G1920V01_GroundedIceHeight.zarr",
-            engine="zarr",
-            storage_options={"anon": True},
-        )
-
+        self.storage_options = {"anon": True} if storage_options is None else storage_options
+        self.chunk_cache = chunk_cache
+        self.instrumentation = instrumentation or Instrumentation()
         # S3fs used to access cubes in python
-        self._s3fs = s3.S3FileSystem(anon=True)
+        self._s3fs = s3.S3FileSystem(**self.storage_options)
         # keep track of open cubes so that we don't re-read xarray metadata and dimension vectors
-        self.open_cubes = {}
+        self.open_cubes = CubePool(
+            self._open_cube_uncached,
+            max_entries=max_open_cubes,
+            max_bytes=max_open_cube_bytes,
+        )
         self._current_catalog = use_catalog
-        with self._s3fs.open(self.catalog[use_catalog], "r") as incubejson:
+        self.cache_dir = cache_dir or os.environ.get("ITS_LIVE_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.catalog_ttl = catalog_ttl
+        # catalog json and its (lon,lat) feature polygons - loaded on first use
+        self._json_all = None
+        self._catalog_polygons = None
+        self._elevation_dataset = None
+        # spatial index (STRtree) over the catalog feature outlines - built on first lookup
+        self._catalog_index = None
+        # concurrent first lookups (e.g. aiter_itslive threads) load the catalog and build the index once
+        self._catalog_lock = threading.RLock()
+        # pyproj transformers keyed by (from_epsg, to_epsg) so they are only built once
+        self._transformers = {}
+
+    @property
+    def json_catalog(self):
+        """geojson catalog of datacubes (loaded from the local cache or S3 on first access)"""
+        if self._json_all is None:
+            with self._catalog_lock:
+                if self._json_all is None:
+                    self._load_catalog()
+        return self._json_all
+
+    @property
+    def transformer_3031(self):
+        return self._get_transformer(4326, 3031)
+
+    @property
+    def elevation_dataset(self):
+        """Antarctic grounded ice height change dataset, opened on first access"""
+        if self._elevation_dataset is None:
+            self._elevation_dataset = xr.open_dataset(
+                "s3://its-live-data/height_change/Antarctica/Grounded/ANT_G1920V01_GroundedIceHeight.zarr",
+                engine="zarr",
+                storage_options=self.storage_options,
+            )
+        return self._elevation_dataset
+
+    def _catalog_fs(self, catalog_url):
+        if catalog_url.startswith("s3://"):
+            return self._s3fs
+        return fsspec.core.url_to_fs(catalog_url)[0]
+
+    def _catalog_version(self, catalog_url):
+        """ETag (or modification time) of the remote catalog, used to validate an expired cache entry"""
+        info = self._catalog_fs(catalog_url).info(catalog_url)
+        for key in ("ETag", "LastModified", "mtime", "size"):
+            if info.get(key) is not None:
+                return str(info[key])
+        return None
+
+    @instrumented("catalog_load")
+    def _load_catalog(self):
+        """load the catalog from the local cache when it is fresh (or still valid), otherwise download and cache it"""
+        catalog_url = self.catalog.get(self._current_catalog, self._current_catalog)
+        cache_file = os.path.join(
+            self.cache_dir,
+            f"catalog_{hashlib.sha1(catalog_url.encode()).hexdigest()[:16]}.pkl",
+        )
+
+        cached = None
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "rb") as incache:
+                    cached = pickle.load(incache)
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                logging.warning(f"ignoring unreadable catalog cache {cache_file}: {e}")
+
+        if cached is not None and cached["url"] == catalog_url:
+            if time.time() - cached["fetched_at"] < self.catalog_ttl:
+                return self._use_cached_catalog(cached)
+            try:
+                version = self._catalog_version(catalog_url)
+            except OSError as e:
+                logging.warning(f"could not validate catalog {catalog_url}, using cached copy: {e}")
+                return self._use_cached_catalog(cached)
+            if version is not None and version == cached["version"]:
+                cached["fetched_at"] = time.time()
+                self._write_catalog_cache(cache_file, cached)
+                return self._use_cached_catalog(cached)
+        else:
+            version = None
+            try:
+                version = self._catalog_version(catalog_url)
+            except OSError:
+                pass
+
+        with self._catalog_fs(catalog_url).open(catalog_url, "r") as incubejson:
             self._json_all = json.load(incubejson)
-        self.json_catalog = self._json_all
+        self._catalog_polygons = np.array(
+            [geometry.shape(f["geometry"]) for f in self._json_all["features"]]
+        )
+        self._catalog_index = None
+        self._write_catalog_cache(
+            cache_file,
+            {
+                "url": catalog_url,
+                "version": version,
+                "fetched_at": time.time(),
+                "catalog": self._json_all,
+                "polygons_wkb": shapely.to_wkb(self._catalog_polygons),
+            },
+        )
+
+    def _use_cached_catalog(self, cached):
+        self._json_all = cached["catalog"]
+        self._catalog_polygons = shapely.from_wkb(cached["polygons_wkb"])
+        self._catalog_index = None
+
+    def _write_catalog_cache(self, cache_file, cached):
+        """write the cache entry atomically so concurrent processes never read a partial file"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "wb") as outcache:
+                pickle.dump(cached, outcache, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logging.warning(f"could not write catalog cache {cache_file}: {e}")
+
+    def _get_transformer(self, from_epsg, to_epsg):
+        """cached always_xy pyproj Transformer between two epsg codes ('3413', 'EPSG:3413', 'epsg:3413' or 3413)"""
+        key = (str(from_epsg).split(":")[-1], str(to_epsg).split(":")[-1])
+        if key not in self._transformers:
+            self._transformers[key] = Transformer.from_crs(
+                f"EPSG:{key[0]}", f"EPSG:{key[1]}", always_xy=True
+            )
+        return self._transformers[key]
+
+    def _transform(self, from_epsg, to_epsg, x, y):
+        """reproject x, y (scalars or arrays) between two epsg codes, timed as a 'reproject' span"""
+        with self.instrumentation.span("reproject", points=int(np.size(x))):
+            return self._get_transformer(from_epsg, to_epsg).transform(x, y)
+
+    def _get_catalog_index(self):
+        """STRtree of prepared (lon,lat) polygons for the catalog features, in catalog order"""
+        if self._catalog_index is None:
+            with self._catalog_lock:
+                if self._catalog_index is None:
+                    if self._catalog_polygons is None:
+                        self._load_catalog()
+                    polygons = self._catalog_polygons
+                    shapely.prepare(polygons)
+                    self._catalog_index = shapely.STRtree(polygons)
+        return self._catalog_index
+
+    def _find_catalog_feature_indices(self, lons, lats):
+        """index of the first catalog feature that contains each lon,lat point (-1 where no feature does)
+        first match in catalog order is kept, same as a linear scan over json_catalog["features"]
+        """
+        points = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        point_idx, feature_idx = self._get_catalog_index().query(
+            np.atleast_1d(points), predicate="within"
+        )
+        no_match = np.iinfo(np.int64).max
+        found = np.full(np.atleast_1d(points).shape[0], no_match, dtype=np.int64)
+        np.minimum.at(found, point_idx, feature_idx)
+        found[found == no_match] = -1
+        return found
+
+    def _find_catalog_feature(self, pointll):
+        """catalog feature whose (lon,lat) outline contains pointll, or None"""
+        idx = self._find_catalog_feature_indices([pointll[0]], [pointll[1]])[0]
+        return self.json_catalog["features"][idx] if idx >= 0 else None
 
     def load_elevation_timeseries(self, lon, lat):
 
@@ -69,46 +266,81 @@ class DATACUBETOOLS:
         )
         return ts["dh"]
 
+    def _zarr_url_for_feature(self, cube_feature):
+        """for zarr store modify URL for use in boto open - change http: to s3: and lose s3.amazonaws.com"""
+        return (
+            cube_feature["properties"]["zarr_url"]
+            .replace("http:", "s3:")
+            .replace(".s3.amazonaws.com", "")
+        )
+
+    def _zarr_store(self, incubeurl):
+        """read-only zarr store for a cube URL (s3://, other fsspec URLs or a local path), wrapped
+        in the chunk cache when one is configured; reads from the underlying store are counted as
+        remote.*, every object zarr asks for (cache hit or not) as chunks.*
+        """
+        if "://" not in incubeurl or incubeurl.startswith("file://"):
+            store = zarr.storage.LocalStore(
+                incubeurl.removeprefix("file://"), read_only=True
+            )
+        else:
+            store = zarr.storage.FsspecStore.from_url(
+                incubeurl, storage_options=self.storage_options, read_only=True
+            )
+        store = InstrumentedStore(store, self.instrumentation, "remote")
+        if self.chunk_cache is not None:
+            store = CachingStore(
+                store, self.chunk_cache, incubeurl, self.instrumentation
+            )
+        return InstrumentedStore(store, self.instrumentation, "chunks")
+
+    def _open_cube_uncached(self, incubeurl):
+        with self.instrumentation.span("cube_open", url=incubeurl):
+            return xr.open_dataset(self._zarr_store(incubeurl), engine="zarr")
+
+    def _open_cube(self, incubeurl):
+        """open zarr datacube lazily, reusing it from .open_cubes if it has already been opened
+        (concurrent callers for the same cube share a single open)
+        """
+        self.instrumentation.count(
+            "cube_pool.hits" if incubeurl in self.open_cubes else "cube_pool.misses"
+        )
+        return self.open_cubes.get(incubeurl)
+
+    def instrumentation_report(self, path=None):
+        """JSON export of the instrumentation spans/counters plus open cube pool and chunk cache stats"""
+        return self.instrumentation.to_json(
+            path,
+            cube_pool=self.open_cubes.stats(),
+            chunk_cache=self.chunk_cache.stats() if self.chunk_cache is not None else None,
+        )
+
+    @instrumented("catalog_lookup")
     def find_datacube_catalog_entry_for_point(self, point_xy, point_epsg_str):
         """
         find catalog feature that contains the point_xy [x,y] in projection point_epsg_str (e.g. '3413')
         returns the catalog feature and the point_tilexy original point coordinates reprojected into the datacube's native projection
-        (cubefeature, point_tilexy)
+        (cubefeature, point_tilexy), or (None, None) if no datacube contains the point
         """
         if point_epsg_str != "4326":
             # point not in lon,lat, set up transformation and convert it to lon,lat (epsg:4326)
             # because the features in the catalog GeoJSON are polygons in 4326
-            inPROJtoLL = pyproj.Transformer.from_proj(
-                f"epsg:{point_epsg_str}", "epsg:4326", always_xy=True
-            )
-            pointll = inPROJtoLL.transform(*point_xy)
+            pointll = self._transform(point_epsg_str, "4326", *point_xy)
         else:
             # point already lon,lat
             pointll = point_xy
 
-        # create Shapely point object for inclusion test
-        point = geometry.Point(*pointll)  # point.coords.xy
-
         # find datacube outline that contains this point in geojson index file
-        cubefeature = None
-
-        for f in self.json_catalog["features"]:
-            polygeom = geometry.shape(f["geometry"])
-            if polygeom.contains(point):
-                cubefeature = f
-                break
+        cubefeature = self._find_catalog_feature(pointll)
 
         if cubefeature:
             # find point x and y in cube native epsg if not already in that projection
             if point_epsg_str == str(cubefeature["properties"]["epsg"]):
                 point_cubexy = point_xy
             else:
-                inPROJtoTilePROJ = pyproj.Transformer.from_proj(
-                    f"epsg:{point_epsg_str}",
-                    f"EPSG:{cubefeature['properties']['epsg']}",
-                    always_xy=True,
+                point_cubexy = self._transform(
+                    point_epsg_str, cubefeature["properties"]["epsg"], *point_xy
                 )
-                point_cubexy = inPROJtoTilePROJ.transform(*point_xy)
 
             print(
                 f"original xy {point_xy} {point_epsg_str} maps to datacube {point_cubexy} "
@@ -169,33 +401,21 @@ class DATACUBETOOLS:
                 # now reproject this point to lat lon and look for new feature
                 if "data_epsg" in cubefeature["properties"]:
                     epsg_source = cubefeature["properties"]["data_epsg"]
-                elif "projection" in cubefeaturea["properties"]:
+                elif "projection" in cubefeature["properties"]:
                     epsg_source = cubefeature["properties"]["projection"]
                 else:
                     epsg_source = None
 
                 if epsg_source is None:
                     print("Source projection not found")
-                    return None
+                    return (None, None)
 
-                cubePROJtoLL = pyproj.Transformer.from_proj(
-                    f'{cubefeature["properties"]["data_epsg"]}',
-                    "epsg:4326",
-                    always_xy=True,
+                newpointll = self._transform(
+                    cubefeature["properties"]["data_epsg"], "4326", *newpoint_cubexy
                 )
-                newpointll = cubePROJtoLL.transform(*newpoint_cubexy)
-
-                # create Shapely point object for inclusion test
-                newpoint = geometry.Point(*newpointll)
 
                 # find datacube outline that contains this point in geojson index file
-                newcubefeature = None
-
-                for f in self.json_catalog["features"]:
-                    polygeom = geometry.shape(f["geometry"])
-                    if polygeom.contains(newpoint):
-                        newcubefeature = f
-                        break
+                newcubefeature = self._find_catalog_feature(newpointll)
 
                 if newcubefeature:
                     # if new feature found, see if original (not offset) point is in this new cube's cube-projection bounding box
@@ -207,12 +427,11 @@ class DATACUBETOOLS:
                         point_cubexy = newpoint_cubexy
                     else:
                         # project original point in this new cube's projection
-                        inPROJtoTilePROJ = pyproj.Transformer.from_proj(
-                            f"epsg:{point_epsg_str}",
+                        point_cubexy = self._transform(
+                            point_epsg_str,
                             newcubefeature["properties"]["data_epsg"],
-                            always_xy=True,
+                            *point_xy,
                         )
-                        point_cubexy = inPROJtoTilePROJ.transform(*point_xy)
 
                     logging.info(
                         f"try 2 original xy {point_xy} {point_epsg_str} with offset maps to new datacube {point_cubexy} "
@@ -237,6 +456,10 @@ class DATACUBETOOLS:
                     else:
                         return (newcubefeature, point_cubexy)
 
+                # no datacube contains the offset point either
+                print(f"No data for point (lon,lat) {pointll} after offset")
+                return (None, None)
+
             else:
                 return (cubefeature, point_cubexy)
 
@@ -244,6 +467,60 @@ class DATACUBETOOLS:
             print(f"No data for point (lon,lat) {pointll}")
             return (None, None)
 
+    @instrumented("catalog_lookup")
+    def find_datacube_catalog_entries_for_points(self, points_xy, point_epsg_str):
+        """vectorized find_datacube_catalog_entry_for_point for an array of points
+        points_xy is an (n, 2) array-like of [x,y] in projection point_epsg_str (e.g. '4326' for lon,lat)
+        all points are reprojected in one call and looked up in the catalog spatial index at once; points
+        are then reprojected into each cube's native projection one cube at a time
+
+        returns a list (one entry per input point) of (cubefeature, point_cubexy) tuples, (None, None) where
+        no datacube contains the point
+        """
+        points_xy = np.asarray(points_xy, dtype=float).reshape(-1, 2)
+        if point_epsg_str != "4326":
+            lons, lats = self._transform(
+                point_epsg_str, "4326", points_xy[:, 0], points_xy[:, 1]
+            )
+        else:
+            lons, lats = points_xy[:, 0], points_xy[:, 1]
+
+        feature_idx = self._find_catalog_feature_indices(lons, lats)
+        entries = [(None, None)] * len(points_xy)
+
+        for idx in np.unique(feature_idx[feature_idx >= 0]):
+            cubefeature = self.json_catalog["features"][idx]
+            members = np.flatnonzero(feature_idx == idx)
+            if point_epsg_str == str(cubefeature["properties"]["epsg"]):
+                cube_x, cube_y = points_xy[members, 0], points_xy[members, 1]
+            else:
+                cube_x, cube_y = self._transform(
+                    point_epsg_str,
+                    cubefeature["properties"]["epsg"],
+                    points_xy[members, 0],
+                    points_xy[members, 1],
+                )
+
+            polygeomxy = geometry.shape(cubefeature["properties"]["geometry_epsg"])
+            inside = shapely.contains_xy(polygeomxy, cube_x, cube_y)
+            for i, x, y, ok in zip(members, cube_x, cube_y, inside):
+                if ok:
+                    entries[i] = (cubefeature, (float(x), float(y)))
+                else:
+                    # point near a cube edge where the lon,lat and cube-projection boxes disagree - use the
+                    # single point search, which retries with an offset point; a point it cannot place
+                    # is left out instead of failing the whole batch
+                    try:
+                        entries[i] = self.find_datacube_catalog_entry_for_point(
+                            points_xy[i].tolist(), point_epsg_str
+                        )
+                    except timeseriesException as e:
+                        logging.info(f"point {points_xy[i].tolist()} {point_epsg_str} skipped: {e}")
+                        entries[i] = (None, None)
+
+        return entries
+
+    @instrumented("get_timeseries_at_point")
     def get_timeseries_at_point(self, point_xy, point_epsg_str, variables=["v"]):
         """pulls time series for a point (closest ITS_LIVE point to given location):
         - calls find_datacube to determine which S3-based datacube the point is in,
@@ -269,21 +546,8 @@ class DATACUBETOOLS:
         if cube_feature is None:
             return (None, None, None)
 
-        # for zarr store modify URL for use in boto open - change http: to s3: and lose s3.amazonaws.com
-        incubeurl = (
-            cube_feature["properties"]["zarr_url"]
-            .replace("http:", "s3:")
-            .replace(".s3.amazonaws.com", "")
-        )
-
-        # if we have already opened this cube, don't open it again
-        if len(self.open_cubes) > 0 and incubeurl in self.open_cubes.keys():
-            ins3xr = self.open_cubes[incubeurl]
-        else:
-            ins3xr = xr.open_dataset(
-                incubeurl, engine="zarr", storage_options={"anon": True}
-            )
-            self.open_cubes[incubeurl] = ins3xr
+        incubeurl = self._zarr_url_for_feature(cube_feature)
+        ins3xr = self._open_cube(incubeurl)
 
         # find time series at the closest grid cell
         # NOTE - returns an xarray Dataset - pt_dataset.v is speed...
@@ -291,12 +555,11 @@ class DATACUBETOOLS:
             x=point_cubexy[0], y=point_cubexy[1], method="nearest"
         )
 
-        logging.info(
-            f"xarray open - elapsed time: {(time.time()-start):10.2f}", flush=True
-        )
+        logging.info(f"xarray open - elapsed time: {(time.time()-start):10.2f}")
 
         # pull data to local machine
-        pt_datset.load()
+        with self.instrumentation.span("load", url=incubeurl):
+            pt_datset.load()
 
         # print(
         #     f"time series loaded {[f'{x}: {pt_datset[x].shape[0]}' for x in variables]} points - elapsed time: {(time.time()-start):10.2f}",
@@ -306,6 +569,138 @@ class DATACUBETOOLS:
 
         return (ins3xr, pt_datset, point_cubexy)
 
+    @instrumented("get_timeseries_at_points")
+    def get_timeseries_at_points(self, points_xy, point_epsg_str, variables=["v"]):
+        """pulls time series for many points at once (closest ITS_LIVE grid cell to each location):
+        - looks up all points in the catalog with find_datacube_catalog_entries_for_points,
+        - groups the points by datacube and opens each cube once (reusing .open_cubes),
+        - extracts every point of a cube with one pointwise (vectorized) .sel, so each zarr chunk
+            is read once per cube instead of once per point
+
+        points_xy is an (n, 2) array-like of [x,y] in projection point_epsg_str
+
+        returns a long-format pandas DataFrame with one row per (point, mid_date): point is the index
+        of the point in points_xy, x and y are the grid cell coordinates in the datacube's projection,
+        cube_url is the datacube the series came from; points outside every datacube are left out
+        """
+        entries = self.find_datacube_catalog_entries_for_points(points_xy, point_epsg_str)
+
+        # point indices and cube xy per cube url
+        groups = {}
+        for i, (cube_feature, point_cubexy) in enumerate(entries):
+            if cube_feature is None:
+                continue
+            members, cubexy = groups.setdefault(
+                self._zarr_url_for_feature(cube_feature), ([], [])
+            )
+            members.append(i)
+            cubexy.append(point_cubexy)
+
+        dfs = []
+        for incubeurl, (members, cubexy) in groups.items():
+            start = time.time()
+            ins3xr = self._open_cube(incubeurl)
+            cubexy = np.asarray(cubexy, dtype=float)
+            pts_dataset = (
+                ins3xr[variables]
+                .sel(
+                    x=xr.DataArray(cubexy[:, 0], dims="point"),
+                    y=xr.DataArray(cubexy[:, 1], dims="point"),
+                    method="nearest",
+                )
+                .assign_coords(point=np.asarray(members))
+            )
+            # pull data for every point in this cube to local machine at once
+            with self.instrumentation.span("load", url=incubeurl, points=len(members)):
+                pts_dataset.load()
+            logging.info(
+                f"{len(members)} points loaded from {incubeurl} - elapsed time: {(time.time()-start):10.2f}"
+            )
+
+            df = pd.DataFrame(self._point_columns(pts_dataset, variables))
+            df["cube_url"] = incubeurl
+            dfs.append(df)
+
+        if not dfs:
+            return pd.DataFrame()
+        return pd.concat(dfs, ignore_index=True)
+
+    def _point_columns(self, pts_dataset, variables):
+        """flatten a loaded (mid_date[, point]) dataset into contiguous numpy columns, point-major
+        (all dates of the first point, then the next point...), without going through to_dataframe
+        """
+        n_dates = pts_dataset.sizes["mid_date"]
+        n_points = pts_dataset.sizes.get("point", 1)
+        columns = {"mid_date": np.tile(pts_dataset["mid_date"].values, n_points)}
+        for name in ["point", "x", "y"]:
+            if name in pts_dataset.coords:
+                columns[name] = np.repeat(np.atleast_1d(pts_dataset[name].values), n_dates)
+        for name in variables:
+            values = pts_dataset[name]
+            if "point" in values.dims:
+                columns[name] = np.ascontiguousarray(
+                    values.transpose("point", "mid_date").values
+                ).ravel()
+            else:
+                columns[name] = np.tile(values.values, n_points)
+        return columns
+
+    def get_timeseries_columns_at_point(
+        self, point_xy, point_epsg_str, columns, as_arrow=False
+    ):
+        """column-projected time series at the closest grid cell to a point:
+        - only the variables named in columns are read, each of them exactly once,
+        - the grid cell is picked by integer index (isel) instead of a nearest-neighbour .sel per variable
+
+        returns a dict of contiguous numpy arrays (mid_date, x, y and every requested column) or, with
+        as_arrow=True, a pyarrow Table with the same columns; None when no datacube contains the point
+        """
+        location = self.locate_point(point_xy, point_epsg_str)
+        if location is None:
+            return None
+        return self.get_timeseries_columns_at_index(*location, columns, as_arrow=as_arrow)
+
+    def locate_point(self, point_xy, point_epsg_str):
+        """(cube url, x index, y index) of the datacube grid cell closest to a point, None if no cube contains it"""
+        cube_feature, point_cubexy = self.find_datacube_catalog_entry_for_point(
+            point_xy, point_epsg_str
+        )
+        if cube_feature is None:
+            return None
+        incubeurl = self._zarr_url_for_feature(cube_feature)
+        ix, iy = self._nearest_grid_index(self._open_cube(incubeurl), point_cubexy)
+        return (incubeurl, ix, iy)
+
+    @instrumented("get_timeseries_columns_at_index")
+    def get_timeseries_columns_at_index(
+        self, incubeurl, ix, iy, columns, mid_date_after=None, as_arrow=False
+    ):
+        """column-projected time series of grid cell (ix, iy) of a cube, see get_timeseries_columns_at_point
+        with mid_date_after only observations with a later mid_date are read
+        """
+        ins3xr = self._open_cube(incubeurl)
+        indexers = dict(x=ix, y=iy)
+        if mid_date_after is not None:
+            mid_dates = ins3xr.indexes["mid_date"]
+            indexers["mid_date"] = np.flatnonzero(
+                mid_dates > pd.Timestamp(mid_date_after).tz_localize(None)
+            )
+        with self.instrumentation.span("load", url=incubeurl):
+            pt_dataset = ins3xr[columns].isel(indexers).load()
+        point_columns = self._point_columns(pt_dataset, columns)
+
+        if as_arrow:
+            import pyarrow as pa
+
+            return pa.table(point_columns)
+        return point_columns
+
+    def _nearest_grid_index(self, ins3xr, point_cubexy):
+        """integer (x, y) indices of the cube grid cell closest to point_cubexy"""
+        ix = ins3xr.indexes["x"].get_indexer([point_cubexy[0]], method="nearest")[0]
+        iy = ins3xr.indexes["y"].get_indexer([point_cubexy[1]], method="nearest")[0]
+        return int(ix), int(iy)
+
     def set_mapping_for_small_cube_from_larger_one(self, smallcube, largecube):
         """when a subset is pulled from an ITS_LIVE datacube, a new geotransform needs to be
         figured out from the smallcube's x and y coordinates and stored in the GeoTransform attribute
@@ -320,12 +715,12 @@ class DATACUBETOOLS:
         smallcube_gt[3] = smallcube.y.max().item() - (
             smallcube_gt[5] / 2.0
         )  # set new ul y value
-        smallcube[
-            "mapping"
-        ] = largecube.mapping  # still need to add new GeoTransform as string
-        smallcube.mapping["GeoTransform"] = " ".join([str(x) for x in smallcube_gt])
+        # copy so the large cube's mapping attributes are not modified, then add new GeoTransform as string
+        smallcube["mapping"] = largecube.mapping.copy(deep=True)
+        smallcube.mapping.attrs["GeoTransform"] = " ".join([str(x) for x in smallcube_gt])
         return
 
+    @instrumented("get_subcube_around_point")
     def get_subcube_around_point(
         self, point_xy, point_epsg_str, half_distance=5000.0, variables=["v"]
     ):
@@ -347,45 +742,36 @@ class DATACUBETOOLS:
             point_xy, point_epsg_str
         )
 
-        # for zarr store modify URL for use in boto open - change http: to s3: and lose s3.amazonaws.com
-        incubeurl = (
-            cube_feature["properties"]["zarr_url"]
-            .replace("http:", "s3:")
-            .replace(".s3.amazonaws.com", "")
-        )
-
-        # if we have already opened this cube, don't open it again
-        if len(self.open_cubes) > 0 and incubeurl in self.open_cubes.keys():
-            ins3xr = self.open_cubes[incubeurl]
-        else:
-            ins3xr = xr.open_dataset(
-                incubeurl, engine="zarr", storage_options={"anon": True}
-            )
-            self.open_cubes[incubeurl] = ins3xr
+        incubeurl = self._zarr_url_for_feature(cube_feature)
+        ins3xr = self._open_cube(incubeurl)
 
         pt_tx, pt_ty = point_cubexy
         lx = ins3xr.coords["x"]
         ly = ins3xr.coords["y"]
 
         start = time.time()
-        small_ins3xr = (
-            ins3xr[variables]
-            .loc[
-                dict(
-                    x=lx[(lx > pt_tx - half_distance) & (lx < pt_tx + half_distance)],
-                    y=ly[(ly > pt_ty - half_distance) & (ly < pt_ty + half_distance)],
-                )
-            ]
-            .load()
-        )
-        print(f"subset and load at {time.time() - start:6.2f} seconds", flush=True)
+        with self.instrumentation.span("load", url=incubeurl):
+            small_ins3xr = (
+                ins3xr[variables]
+                .loc[
+                    dict(
+                        x=lx[(lx > pt_tx - half_distance) & (lx < pt_tx + half_distance)],
+                        y=ly[(ly > pt_ty - half_distance) & (ly < pt_ty + half_distance)],
+                    )
+                ]
+                .load()
+            )
+        logging.info(f"subset and load at {time.time() - start:6.2f} seconds")
 
         # now fix the CF compliant geolocation/mapping of the smaller cube
         self.set_mapping_for_small_cube_from_larger_one(small_ins3xr, ins3xr)
 
         return (ins3xr, small_ins3xr, point_cubexy)
 
-    def get_subcube_for_bounding_box(self, bbox, bbox_epsg_str, variables=["v"]):
+    @instrumented("get_subcube_for_bounding_box")
+    def get_subcube_for_bounding_box(
+        self, bbox, bbox_epsg_str, variables=["v"], mosaic=False
+    ):
         """pulls subset of cube within bbox (unless edge of cube is included) containing specified variables:
         - calls find_datacube to determine which S3-based datacube the bbox central point is in,
         - opens that xarray datacube - which is also added to the open_cubes list, so that it won't need to be reopened (which can take O(5 sec) ),
@@ -400,7 +786,11 @@ class DATACUBETOOLS:
             - smaller cube as xarray (loaded to memory),
             - original bbox central point xy in datacube's projection
             )
+
+        with mosaic=True every datacube the bbox touches is used, see get_subcube_for_bounding_box_mosaic
         """
+        if mosaic:
+            return self.get_subcube_for_bounding_box_mosaic(bbox, bbox_epsg_str, variables)
 
         start = time.time()
 
@@ -429,40 +819,271 @@ class DATACUBETOOLS:
             )
             return None
 
-        # for zarr store modify URL for use in boto open - change http: to s3: and lose s3.amazonaws.com
-        incubeurl = (
-            cube_feature["properties"]["zarr_url"]
-            .replace("http:", "s3:")
-            .replace(".s3.amazonaws.com", "")
-        )
-
-        # if we have already opened this cube, don't open it again
-        if len(self.open_cubes) > 0 and incubeurl in self.open_cubes.keys():
-            ins3xr = self.open_cubes[incubeurl]
-        else:
-            # open zarr format xarray datacube on AWS S3
-            ins3xr = xr.open_dataset(
-                incubeurl, engine="zarr", storage_options={"anon": True}
-            )
-            self.open_cubes[incubeurl] = ins3xr
+        incubeurl = self._zarr_url_for_feature(cube_feature)
+        ins3xr = self._open_cube(incubeurl)
 
         lx = ins3xr.coords["x"]
         ly = ins3xr.coords["y"]
 
         start = time.time()
-        small_ins3xr = (
-            ins3xr[variables]
-            .loc[
+        with self.instrumentation.span("load", url=incubeurl):
+            small_ins3xr = (
+                ins3xr[variables]
+                .loc[
+                    dict(
+                        x=lx[(lx >= bbox_minx) & (lx <= bbox_maxx)],
+                        y=ly[(ly >= bbox_miny) & (ly <= bbox_maxy)],
+                    )
+                ]
+                .load()
+            )
+        logging.info(f"subset and load at {time.time() - start:6.2f} seconds")
+
+        # now fix the CF compliant geolocation/mapping of the smaller cube
+        self.set_mapping_for_small_cube_from_larger_one(small_ins3xr, ins3xr)
+
+        return (ins3xr, small_ins3xr, bbox_centrer_point_cubexy)
+
+    def _chunk_sizes(self, ins3xr, variables):
+        """zarr chunk size along mid_date, y and x of the first requested variable that has them"""
+        for name in variables:
+            var = ins3xr[name]
+            chunks = var.encoding.get("preferred_chunks") or dict(
+                zip(var.dims, var.encoding.get("chunks") or ())
+            )
+            if chunks:
+                return {dim: chunks.get(dim, ins3xr.sizes[dim]) for dim in ("mid_date", "y", "x")}
+        return dict(ins3xr.sizes)
+
+    def _aligned_blocks(self, start, stop, size):
+        """split index range [start, stop) at multiples of size (i.e. at zarr chunk boundaries)"""
+        edges = [start] + list(range((start // size + 1) * size, stop, size)) + [stop]
+        return [slice(a, b) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+    def iter_subcube_tiles(
+        self, ins3xr, x_slice, y_slice, variables=["v"], by="space", tile_size=None
+    ):
+        """generator over the window (x_slice, y_slice) of an open cube, loading one zarr-chunk-aligned
+        tile at a time so that only one tile is ever held in memory:
+        - by='space' yields spatial tiles (all mid_dates, one y by x block of chunks at a time),
+        - by='time' yields the full window one mid_date block at a time
+
+        tile_size overrides the tile shape in grid cells, e.g. {"x": 50, "y": 50} or {"mid_date": 1000};
+        it defaults to the cube's chunk sizes. Every tile is loaded xarray with its own coordinates and a
+        'mapping' whose GeoTransform matches the tile
+        """
+        sizes = {**self._chunk_sizes(ins3xr, variables), **(tile_size or {})}
+        if by == "space":
+            blocks = (
+                dict(y=y_block, x=x_block)
+                for y_block in self._aligned_blocks(y_slice.start, y_slice.stop, sizes["y"])
+                for x_block in self._aligned_blocks(x_slice.start, x_slice.stop, sizes["x"])
+            )
+        elif by == "time":
+            blocks = (
+                dict(x=x_slice, y=y_slice, mid_date=t_block)
+                for t_block in self._aligned_blocks(0, ins3xr.sizes["mid_date"], sizes["mid_date"])
+            )
+        else:
+            raise ValueError(f"by must be 'space' or 'time', not {by!r}")
+
+        for block in blocks:
+            with self.instrumentation.span("load", tile=str(block)):
+                tile = ins3xr[variables].isel(block).load()
+            self.set_mapping_for_small_cube_from_larger_one(tile, ins3xr)
+            yield tile
+
+    def _index_window(self, mask):
+        """contiguous index slice covering the True entries of mask over a monotonic coordinate"""
+        idx = np.flatnonzero(mask)
+        return slice(int(idx.min()), int(idx.max()) + 1) if len(idx) else slice(0, 0)
+
+    def iter_subcube_around_point(
+        self,
+        point_xy,
+        point_epsg_str,
+        half_distance=5000.0,
+        variables=["v"],
+        by="space",
+        tile_size=None,
+    ):
+        """streaming version of get_subcube_around_point: yields the subcube tile by tile (see iter_subcube_tiles)
+        instead of loading it all at once
+        """
+        cube_feature, point_cubexy = self.find_datacube_catalog_entry_for_point(
+            point_xy, point_epsg_str
+        )
+        ins3xr = self._open_cube(self._zarr_url_for_feature(cube_feature))
+
+        pt_tx, pt_ty = point_cubexy
+        lx = ins3xr.coords["x"].values
+        ly = ins3xr.coords["y"].values
+        x_slice = self._index_window((lx > pt_tx - half_distance) & (lx < pt_tx + half_distance))
+        y_slice = self._index_window((ly > pt_ty - half_distance) & (ly < pt_ty + half_distance))
+        yield from self.iter_subcube_tiles(ins3xr, x_slice, y_slice, variables, by, tile_size)
+
+    def iter_subcube_for_bounding_box(
+        self, bbox, bbox_epsg_str, variables=["v"], by="space", tile_size=None
+    ):
+        """streaming version of get_subcube_for_bounding_box: yields the subcube tile by tile (see iter_subcube_tiles)
+        instead of loading it all at once; bbox must be in the datacube's projection
+        """
+        bbox_minx, bbox_miny, bbox_maxx, bbox_maxy = bbox
+        cube_feature, _ = self.find_datacube_catalog_entry_for_point(
+            [(bbox_minx + bbox_maxx) / 2.0, (bbox_miny + bbox_maxy) / 2.0], bbox_epsg_str
+        )
+        if cube_feature["properties"]["data_epsg"].split(":")[-1] != bbox_epsg_str:
+            print(
+                f'bbox is in epsg:{bbox_epsg_str}, should be in datacube {cube_feature["properties"]["data_epsg"]}'
+            )
+            return
+        ins3xr = self._open_cube(self._zarr_url_for_feature(cube_feature))
+
+        lx = ins3xr.coords["x"].values
+        ly = ins3xr.coords["y"].values
+        x_slice = self._index_window((lx >= bbox_minx) & (lx <= bbox_maxx))
+        y_slice = self._index_window((ly >= bbox_miny) & (ly <= bbox_maxy))
+        yield from self.iter_subcube_tiles(ins3xr, x_slice, y_slice, variables, by, tile_size)
+
+    @instrumented("catalog_lookup")
+    def find_datacube_catalog_entries_for_bbox(self, bbox, bbox_epsg_str):
+        """all catalog features whose (lon,lat) outline intersects bbox = [ minx, miny, maxx, maxy ] in bbox_epsg_str,
+        in catalog order
+        """
+        bbox_polygon = geometry.box(*bbox)
+        if bbox_epsg_str != "4326":
+            # densify the edges before reprojecting so curved bbox sides in lon,lat are followed
+            edge = max(bbox[2] - bbox[0], bbox[3] - bbox[1]) / 32.0
+            ring = shapely.get_coordinates(
+                shapely.segmentize(bbox_polygon, max_segment_length=edge).exterior
+            )
+            lons, lats = self._transform(bbox_epsg_str, "4326", ring[:, 0], ring[:, 1])
+            bbox_polygon = geometry.Polygon(np.column_stack([lons, lats]))
+        feature_idx = self._get_catalog_index().query(bbox_polygon, predicate="intersects")
+        return [self.json_catalog["features"][i] for i in np.sort(feature_idx)]
+
+    def _mosaic_piece(self, cube_feature, variables, grid_x, grid_y, target_epsg):
+        """(open cube, part of the mosaic grid covered by it, loaded and placed on (grid_y, grid_x)):
+        the cube is opened here so that opening and loading overlap across workers; the part is NaN where
+        the cube has no data and None if the cube does not reach the grid
+        """
+        ins3xr = self._open_cube(self._zarr_url_for_feature(cube_feature))
+        res = abs(float(grid_x[1] - grid_x[0])) if len(grid_x) > 1 else 120.0
+        cube_epsg = cube_feature["properties"]["data_epsg"].split(":")[-1]
+
+        if cube_epsg == target_epsg:
+            lx = ins3xr.coords["x"]
+            ly = ins3xr.coords["y"]
+            half = res / 2.0
+            window = ins3xr[variables].loc[
                 dict(
-                    x=lx[(lx >= bbox_minx) & (lx <= bbox_maxx)],
-                    y=ly[(ly >= bbox_miny) & (ly <= bbox_maxy)],
+                    x=lx[(lx >= grid_x.min() - half) & (lx <= grid_x.max() + half)],
+                    y=ly[(ly >= grid_y.min() - half) & (ly <= grid_y.max() + half)],
                 )
             ]
-            .load()
+            if window.sizes["x"] == 0 or window.sizes["y"] == 0:
+                return ins3xr, None
+            with self.instrumentation.span("load", url=cube_feature["properties"]["zarr_url"]):
+                window.load()
+            return ins3xr, window.reindex(
+                x=grid_x, y=grid_y, method="nearest", tolerance=half
+            )
+
+        # different projection: nearest cube cell for every mosaic cell center
+        gx, gy = np.meshgrid(grid_x, grid_y)
+        src_x, src_y = self._transform(target_epsg, cube_epsg, gx, gy)
+        ix = ins3xr.indexes["x"].get_indexer(src_x.ravel(), method="nearest", tolerance=res)
+        iy = ins3xr.indexes["y"].get_indexer(src_y.ravel(), method="nearest", tolerance=res)
+        valid = (ix >= 0) & (iy >= 0)
+        if not valid.any():
+            return ins3xr, None
+
+        # load only the cube window the mosaic cells fall in, then resample it in memory
+        x0, x1 = ix[valid].min(), ix[valid].max() + 1
+        y0, y1 = iy[valid].min(), iy[valid].max() + 1
+        with self.instrumentation.span("load", url=cube_feature["properties"]["zarr_url"]):
+            window = ins3xr[variables].isel(x=slice(x0, x1), y=slice(y0, y1)).load()
+        piece = window.isel(
+            x=xr.DataArray(np.where(valid, ix - x0, 0).reshape(gx.shape), dims=("y", "x")),
+            y=xr.DataArray(np.where(valid, iy - y0, 0).reshape(gx.shape), dims=("y", "x")),
+        ).drop_vars(["x", "y"], errors="ignore")
+        valid = xr.DataArray(valid.reshape(gx.shape), dims=("y", "x"))
+        for name in piece.data_vars:
+            if {"x", "y"} <= set(piece[name].dims):
+                piece[name] = piece[name].where(valid)
+        return ins3xr, piece.assign_coords(x=grid_x, y=grid_y)
+
+    @instrumented("get_subcube_for_bounding_box_mosaic")
+    def get_subcube_for_bounding_box_mosaic(
+        self, bbox, bbox_epsg_str, variables=["v"], max_workers=4
+    ):
+        """pulls subset of every datacube that intersects bbox and mosaics them onto one grid in bbox_epsg_str:
+        - finds all catalog features the bbox touches (find_datacube_catalog_entries_for_bbox),
+        - opens the cubes and loads their parts of the bbox in parallel (max_workers threads),
+        - cubes in another projection are resampled (nearest cell) onto the bbox grid,
+        - pieces are stacked along mid_date (each cube keeps its own image pairs, NaN outside its footprint)
+
+        the grid uses the resolution and pixel-center alignment of the first cube in bbox_epsg_str (or the
+        first cube when none is), and 'mapping' carries the GeoTransform of the mosaic
+
+        returns(
+            - list of xarray open full cubes used,
+            - mosaic cube as xarray (loaded to memory),
+            - bbox
+            )
+        or None when no datacube intersects bbox
+        """
+        start = time.time()
+        target_epsg = str(bbox_epsg_str).split(":")[-1]
+        cube_features = self.find_datacube_catalog_entries_for_bbox(bbox, target_epsg)
+        if not cube_features:
+            print(f"No data for bbox {bbox} epsg:{target_epsg}")
+            return None
+
+        # only the reference cube is opened up front (it defines the grid); workers open the rest
+        same_epsg = [
+            f for f in cube_features if f["properties"]["data_epsg"].split(":")[-1] == target_epsg
+        ]
+        reference = self._open_cube(
+            self._zarr_url_for_feature(same_epsg[0] if same_epsg else cube_features[0])
         )
-        print(f"subset and load at {time.time() - start:6.2f} seconds", flush=True)
+        res = abs(float(reference.x[1] - reference.x[0]))
 
-        # now fix the CF compliant geolocation/mapping of the smaller cube
-        self.set_mapping_for_small_cube_from_larger_one(small_ins3xr, ins3xr)
+        # mosaic grid snapped to the reference cube's pixel centers
+        bbox_minx, bbox_miny, bbox_maxx, bbox_maxy = bbox
+        x_origin = float(reference.x[0]) if same_epsg else bbox_minx + res / 2.0
+        y_origin = float(reference.y[0]) if same_epsg else bbox_maxy - res / 2.0
+        grid_x = x_origin + res * np.arange(
+            np.ceil((bbox_minx - x_origin) / res), np.floor((bbox_maxx - x_origin) / res) + 1
+        )
+        grid_y = y_origin - res * np.arange(
+            np.ceil((y_origin - bbox_maxy) / res), np.floor((y_origin - bbox_miny) / res) + 1
+        )
 
-        return (ins3xr, small_ins3xr, bbox_centrer_point_cubexy)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            opened = list(
+                executor.map(
+                    lambda f: self._mosaic_piece(f, variables, grid_x, grid_y, target_epsg),
+                    cube_features,
+                )
+            )
+        cubes = [cube for cube, _ in opened]
+        pieces = [piece for _, piece in opened if piece is not None]
+        if not pieces:
+            print(f"No data for bbox {bbox} epsg:{target_epsg}")
+            return None
+
+        mosaic = xr.concat(pieces, dim="mid_date").sortby("mid_date")
+        logging.info(f"mosaic of {len(pieces)} cubes at {time.time() - start:6.2f} seconds")
+
+        # now fix the CF compliant geolocation/mapping of the mosaic
+        if same_epsg:
+            self.set_mapping_for_small_cube_from_larger_one(mosaic, reference)
+        else:
+            mapping_attrs = CRS.from_epsg(int(target_epsg)).to_cf()
+            mapping_attrs["GeoTransform"] = f"0 {res} 0 0 0 {-res}"
+            self.set_mapping_for_small_cube_from_larger_one(
+                mosaic, xr.Dataset({"mapping": xr.DataArray(0, attrs=mapping_attrs)})
+            )
+
+        return (cubes, mosaic, bbox)
@@ -0,0 +1,172 @@
+# timing spans and I/O counters for datacube access
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from zarr.storage import WrapperStore
+
+# name of the span currently open in this thread/task, used as parent of nested spans
+_current_span = contextvars.ContextVar("its_live_current_span", default=None)
+
+
+class Instrumentation:
+    """
+    collects per-call timing spans and cumulative counters for DATACUBETOOLS
+
+    - span(name, **attrs) is a context manager that records wall time, the enclosing span, attributes and the
+        change of every counter while it was open (counter deltas include other threads' work when calls overlap)
+    - count(name, value) adds to a cumulative counter (bytes read, chunks touched, cache hits, ...)
+    - callbacks added with add_callback(fn) receive every finished span record, e.g. to forward to a metrics system
+    - capture() is a context manager that collects the span records of a block of code
+    - summary() aggregates spans by name, to_json() exports spans, summary and counters
+
+    only the last max_spans span records are kept
+    """
+
+    def __init__(self, max_spans=10000):
+        self.spans = deque(maxlen=max_spans)
+        self.counters = {}
+        self.callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self.callbacks.remove(callback)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """time the enclosed block as span name; attrs (and keys added to the yielded dict) are kept with it"""
+        with self._lock:
+            counters_before = dict(self.counters)
+        parent = _current_span.get()
+        token = _current_span.set(name)
+        record = {"name": name, "parent": parent, "start": time.time(), **attrs}
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = repr(e)
+            raise
+        finally:
+            record["duration"] = time.perf_counter() - start
+            _current_span.reset(token)
+            with self._lock:
+                record["counters"] = {
+                    key: value - counters_before.get(key, 0)
+                    for key, value in self.counters.items()
+                    if value != counters_before.get(key, 0)
+                }
+                self.spans.append(record)
+            for callback in list(self.callbacks):
+                callback(record)
+
+    @contextmanager
+    def capture(self):
+        """collect the span records finished inside the with block into the yielded list"""
+        records = []
+        self.add_callback(records.append)
+        try:
+            yield records
+        finally:
+            self.remove_callback(records.append)
+
+    def summary(self):
+        """count, total, mean and max duration (seconds) per span name"""
+        with self._lock:
+            spans = list(self.spans)
+        summary = {}
+        for record in spans:
+            entry = summary.setdefault(
+                record["name"], {"count": 0, "total": 0.0, "max": 0.0}
+            )
+            entry["count"] += 1
+            entry["total"] += record["duration"]
+            entry["max"] = max(entry["max"], record["duration"])
+        for entry in summary.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return summary
+
+    def to_dict(self):
+        summary = self.summary()
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "summary": summary,
+                "spans": list(self.spans),
+            }
+
+    def to_json(self, path=None, **extra):
+        """export spans, summary and counters (plus any extra sections) as JSON; written to path if given"""
+        report = {**self.to_dict(), **extra}
+        text = json.dumps(report, default=str, indent=1)
+        if path is not None:
+            with open(path, "w") as outjson:
+                outjson.write(text)
+        return text
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+
+def instrumented(span_name):
+    """method decorator: run the method inside self.instrumentation.span(span_name)"""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instrumentation.span(span_name):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class InstrumentedStore(WrapperStore):
+    """
+    zarr store wrapper that counts objects read ('<name>.gets'), bytes ('<name>.bytes') and cumulative
+    time spent waiting on reads ('<name>.seconds', summed over concurrent reads)
+    """
+
+    def __init__(self, store, instrumentation, name):
+        super().__init__(store)
+        self._instrumentation = instrumentation
+        self._name = name
+
+    def _with_store(self, store):
+        return type(self)(store, self._instrumentation, self._name)
+
+    def __repr__(self):
+        return f"InstrumentedStore({self._store!r}, '{self._name}')"
+
+    async def get(self, key, prototype, byte_range=None):
+        start = time.perf_counter()
+        buf = await self._store.get(key, prototype, byte_range)
+        self._instrumentation.count(f"{self._name}.seconds", time.perf_counter() - start)
+        self._instrumentation.count(f"{self._name}.gets")
+        if buf is not None:
+            self._instrumentation.count(f"{self._name}.bytes", len(buf))
+        return buf
+
+    async def get_partial_values(self, prototype, key_ranges):
+        key_ranges = list(key_ranges)
+        start = time.perf_counter()
+        bufs = await self._store.get_partial_values(prototype, key_ranges)
+        self._instrumentation.count(f"{self._name}.seconds", time.perf_counter() - start)
+        self._instrumentation.count(f"{self._name}.gets", len(key_ranges))
+        self._instrumentation.count(
+            f"{self._name}.bytes", sum(len(buf) for buf in bufs if buf is not None)
+        )
+        return bufs
@@ -20,5 +20,134 @@ def app(port=8888, host="localhost"):
     import os
     os.system(f"streamlit run app.py --server.port {port} --server.address {host}")
 
+@cli.command(
+    "batch",
+    sites=Arg(
+        "--sites",
+        help="JSON like glaciares.json ({name: [lat, lon]}) or CSV with lat, lon (and name) columns."
+    ),
+    out_dir=Arg(
+        "--out-dir",
+        help="Where per-site checkpoints and the forecasts/metrics Parquet files are written."
+    ),
+    models=Arg(
+        "--models",
+        help="Comma-separated models to train (xgboost, gbr, arima)."
+    ),
+    workers=Arg(
+        "--workers",
+        help="Number of worker processes (default: one per CPU)."
+    ),
+    min_dt=Arg(
+        "--min-dt",
+        help="Minimum separation in days between image pairs."
+    ),
+    max_dt=Arg(
+        "--max-dt",
+        help="Maximum separation in days between image pairs."
+    ),
+    cadence=Arg(
+        "--cadence",
+        help="Bin observations every N days before training (0 to keep raw observations)."
+    ),
+    until=Arg(
+        "--until",
+        help="Last forecast date."
+    ),
+    catalog=Arg(
+        "--catalog",
+        help="ITS_LIVE catalog key or URL/path of a GeoJSON datacube catalog."
+    ),
+    fresh=Arg(
+        "--fresh",
+        help="Ignore existing checkpoints and recompute every site."
+    ),
+    data_max_age=Arg(
+        "--data-max-age",
+        help="Hours after which a site's observations are fetched again (0 to never refetch)."
+    ),
+)
+def batch(
+    sites="glaciares.json",
+    out_dir="results",
+    models="xgboost,gbr,arima",
+    workers=None,
+    min_dt=1,
+    max_dt=120,
+    cadence=0,
+    until="2030-12-31",
+    catalog=None,
+    fresh: bool = False,
+    data_max_age=24,
+):
+    """
+    Run fetch, processing, training and forecasting headlessly for many glaciers in a process pool.
+    """
+    from pipeline import load_sites, run_pipeline
+    runs = run_pipeline(
+        load_sites(sites),
+        out_dir=out_dir,
+        models=[m for m in models.split(",") if m],
+        workers=int(workers) if workers else None,
+        min_dt=int(min_dt),
+        max_dt=int(max_dt),
+        cadence=int(cadence) or None,
+        until=until,
+        catalog=catalog,
+        fresh=fresh,
+        data_max_age=float(data_max_age) or None,
+    )
+    print(f"{(runs['status'] == 'ok').sum()}/{len(runs)} sites ok, results in {out_dir}")
+
+@cli.command(
+    "bench",
+    sizes=Arg(
+        "--sizes",
+        help="Comma-separated synthetic datacube sizes (small, medium, large)."
+    ),
+    models=Arg(
+        "--models",
+        help="Comma-separated trainers to time (xgboost, gbr, arima); empty to skip."
+    ),
+    repeat=Arg(
+        "--repeat",
+        help="Repetitions per data-access benchmark."
+    ),
+    data_dir=Arg(
+        "--data-dir",
+        help="Where the synthetic cubes and catalogs are generated."
+    ),
+    out_dir=Arg(
+        "--out-dir",
+        help="Where the JSON results are written."
+    ),
+    baseline=Arg(
+        "--baseline",
+        help="Previous results JSON to compare against."
+    ),
+)
+def bench(
+    sizes="small",
+    models="xgboost,gbr,arima",
+    repeat=3,
+    data_dir="benchmarks/data",
+    out_dir="benchmarks/results",
+    baseline=None,
+):
+    """
+    Run the offline benchmark suite on a synthetic local datacube and catalog.
+    """
+    from benchmarks.run import run_benchmarks
+    _, regressions = run_benchmarks(
+        sizes=[s for s in sizes.split(",") if s],
+        models=[m for m in models.split(",") if m],
+        repeat=int(repeat),
+        data_dir=data_dir,
+        out_dir=out_dir,
+        baseline=baseline,
+    )
+    if regressions:
+        raise SystemExit(f"{len(regressions)} benchmarks slower than the baseline")
+
 if __name__ == "__main__":
     cli.run()
\ No newline at end of file
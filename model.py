@@ -1,34 +1,178 @@
-from sklearn.model_selection import TimeSeriesSplit, GridSearchCV
+from sklearn.model_selection import TimeSeriesSplit, ParameterGrid
+import os
+import time
+import numpy as np
 import xgboost as xgb
 
-def get_xgboost_model(X_train, y_train):
+PARAM_GRID = {
+    'n_estimators': [200, 500, 1000],
+    'learning_rate': [0.01, 0.1],
+    'max_depth': [3, 5],
+    'subsample': [0.7, 1.0],
+    'colsample_bytree': [0.7, 1.0]
+}
+
+def get_xgboost_model(X_train, y_train, search="grid", nthread=None):
     """
-    Train an XGBoost model on the provided training data using GridSearchCV (sin lags).
+    Train an XGBoost model on the provided training data.
+    Uses every column of X_train: calendar only, or lags/rolling/harmonics from features.FeatureEngine.
+
+    search="grid" evaluates every combination of PARAM_GRID; search="halving" runs successive halving
+    over boosting rounds (see _halving_search). Both run on an XGBFoldEngine (hist trees, nthread
+    threads, all cores by default) and return the refit best model and a cv_results_-like dict.
     """
+    if search not in ("grid", "halving"):
+        raise ValueError(f"search must be 'grid' or 'halving', got {search!r}")
     features = X_train.columns.tolist()
 
-    model = xgb.XGBRegressor(random_state=42)
+    engine = XGBFoldEngine(X_train[features], y_train, n_splits=5, nthread=nthread)
+    if search == "halving":
+        best_params, cv_results = _halving_search(engine, PARAM_GRID)
+    else:
+        best_params, cv_results = _grid_search(engine, PARAM_GRID)
+    print(f"Mejores hiperparámetros: {best_params}")
+    print(f"Mejor score (neg RMSE): {cv_results['mean_test_score'].max()}")
 
-    param_grid = {
-        'n_estimators': [200, 500, 1000],
-        'learning_rate': [0.01, 0.1],
-        'max_depth': [3, 5],
-        'subsample': [0.7, 1.0],
-        'colsample_bytree': [0.7, 1.0]
-    }
+    best_model = xgb.XGBRegressor(
+        random_state=engine.random_state,
+        tree_method="hist",
+        max_bin=engine.max_bin,
+        n_jobs=engine.nthread,
+        **best_params
+    )
+    best_model.fit(X_train[features], y_train)
+    return best_model, cv_results
 
-    tscv = TimeSeriesSplit(n_splits=5)
-    grid_search = GridSearchCV(
-        model,
-        param_grid,
-        cv=tscv,
-        scoring='neg_root_mean_squared_error',
-        n_jobs=-1,
-        verbose=1
+def update_xgboost_model(model, new_X, new_y, num_boost_round=20):
+    """
+    Continue boosting a fitted XGBRegressor with num_boost_round more trees fitted on the new observations
+    only (the existing trees are kept as they are). Returns a new model; the update is recorded in
+    model.updates (see updates.record_update).
+    """
+    from updates import record_update
+    start = time.perf_counter()
+    booster = model.get_booster()
+    updated = xgb.XGBRegressor(**{**model.get_params(), "n_estimators": num_boost_round})
+    updated.fit(new_X[booster.feature_names or new_X.columns], new_y, xgb_model=booster)
+    updated.updates = list(getattr(model, "updates", []))
+    record_update(
+        updated, "xgboost_boost", new_X, time.perf_counter() - start,
+        num_boost_round=num_boost_round, total_trees=updated.get_booster().num_boosted_rounds(),
     )
+    return updated
+
+class XGBFoldEngine:
+    """
+    TimeSeriesSplit folds of (X, y) prepared once for many XGBoost configurations.
+
+    The training part of each fold is quantized into a QuantileDMatrix (histogram bins) a single time and
+    the validation part is kept as a float32 array for inplace_predict, so evaluating a configuration only
+    pays for boosting. Trees are always 'hist' with nthread threads (all cores by default).
+    """
+
+    def __init__(self, X, y, n_splits=5, nthread=None, max_bin=256, random_state=42):
+        self.nthread = nthread or os.cpu_count()
+        self.max_bin = max_bin
+        self.random_state = random_state
+        self.feature_names = [str(c) for c in X.columns]
+        X = np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+        y = np.asarray(y, dtype=np.float32)
+
+        self.folds = []
+        for train_idx, val_idx in TimeSeriesSplit(n_splits=n_splits).split(X):
+            dtrain = xgb.QuantileDMatrix(
+                X[train_idx], y[train_idx], max_bin=max_bin, nthread=self.nthread,
+                feature_names=self.feature_names,
+            )
+            self.folds.append((dtrain, X[val_idx], y[val_idx]))
+
+    def _params(self, config):
+        return {
+            "objective": "reg:squarederror",
+            "tree_method": "hist",
+            "max_bin": self.max_bin,
+            "nthread": self.nthread,
+            "seed": self.random_state,
+            **config,
+        }
+
+    def train(self, config, fold, num_boost_round, booster=None):
+        """Boost num_boost_round more rounds on fold (continuing booster if given)."""
+        return xgb.train(
+            self._params(config), self.folds[fold][0], num_boost_round=num_boost_round, xgb_model=booster
+        )
 
-    grid_search.fit(X_train[features], y_train)
-    print(f"Mejores hiperparámetros: {grid_search.best_params_}")
-    print(f"Mejor score (neg MSE): {grid_search.best_score_}")
+    def score(self, booster, fold, n_estimators=None):
+        """neg RMSE on the validation part of fold using the first n_estimators trees (all if None)."""
+        _, X_val, y_val = self.folds[fold]
+        iteration_range = (0, n_estimators) if n_estimators else (0, 0)
+        y_pred = booster.inplace_predict(X_val, iteration_range=iteration_range)
+        return -float(np.sqrt(np.mean((y_val - y_pred) ** 2)))
 
-    return grid_search.best_estimator_, grid_search.cv_results_
\ No newline at end of file
+def _grid_search(engine, param_grid):
+    """
+    Exhaustive search: one model per configuration (without n_estimators) and fold, boosted up to the
+    largest n_estimators; every smaller n_estimators is scored from the same model's first trees.
+    """
+    rounds = sorted(param_grid["n_estimators"])
+    configs = list(ParameterGrid({k: v for k, v in param_grid.items() if k != "n_estimators"}))
+    scores = {}
+    for c, config in enumerate(configs):
+        boosters = [engine.train(config, f, rounds[-1]) for f in range(len(engine.folds))]
+        for n_estimators in rounds:
+            scores[(c, n_estimators)] = [engine.score(b, f, n_estimators) for f, b in enumerate(boosters)]
+    return _cv_results(configs, scores, param_grid, len(engine.folds))
+
+def _halving_search(engine, param_grid, factor=3):
+    """
+    Successive halving with boosting rounds as the resource.
+
+    Every configuration of the grid without n_estimators is one boosted model per fold that keeps
+    growing: it is trained up to the smallest n_estimators, scored on the fold, and only the best
+    1/factor of the configurations continue boosting up to the next n_estimators.
+    A configuration is never refit from scratch for a larger n_estimators.
+    """
+    rounds = sorted(param_grid["n_estimators"])
+    configs = list(ParameterGrid({k: v for k, v in param_grid.items() if k != "n_estimators"}))
+
+    boosters = {}
+    scores = {}
+    alive = list(range(len(configs)))
+    trained = 0
+    for n_estimators in rounds:
+        for c in alive:
+            fold_scores = []
+            for f in range(len(engine.folds)):
+                boosters[(c, f)] = engine.train(configs[c], f, n_estimators - trained, boosters.get((c, f)))
+                fold_scores.append(engine.score(boosters[(c, f)], f))
+            scores[(c, n_estimators)] = fold_scores
+        trained = n_estimators
+        # solo sigue entrenando la mejor fracción de configuraciones
+        alive.sort(key=lambda c: np.mean(scores[(c, n_estimators)]), reverse=True)
+        alive = alive[:max(1, int(np.ceil(len(alive) / factor)))]
+        print(f"n_estimators={n_estimators}: {len(alive)} configuraciones siguen")
+
+    return _cv_results(configs, scores, param_grid, len(engine.folds))
+
+def _cv_results(configs, scores, param_grid, n_splits):
+    """
+    Best parameters and a cv_results_-like dict with one entry per (configuration, n_estimators) evaluated:
+    params, param_<name>, split<i>_test_score, mean/std/rank_test_score and n_resources (boosting rounds).
+    """
+    keys = list(scores)
+    split_scores = np.array([scores[key] for key in keys])
+    mean = split_scores.mean(axis=1)
+    rank = np.empty(len(keys), dtype=np.int32)
+    rank[np.argsort(-mean, kind="stable")] = np.arange(1, len(keys) + 1)
+
+    params = [{**configs[c], "n_estimators": n} for c, n in keys]
+    cv_results = {
+        "params": params,
+        **{f"param_{name}": np.array([p[name] for p in params], dtype=object) for name in param_grid},
+        **{f"split{i}_test_score": split_scores[:, i] for i in range(n_splits)},
+        "mean_test_score": mean,
+        "std_test_score": split_scores.std(axis=1),
+        "rank_test_score": rank,
+        "n_resources": np.array([n for _, n in keys]),
+    }
+    return params[int(np.argmin(rank))], cv_results
@@ -121,3 +121,100 @@ class DenseLSTM(nn.Module):
                 out = self(inputs)
                 predictions.append(out.float().detach().cpu().numpy())
         return np.concatenate(predictions, axis=0)
+
+
+def make_sequences(X, seq_len, y=None):
+    """
+    Ventanas (n - seq_len + 1, seq_len, features) de filas consecutivas de X; cada ventana termina en la
+    fila cuyo objetivo predice (y[seq_len - 1:] si se da y).
+    """
+    X = np.asarray(X, dtype=np.float32)
+    windows = np.lib.stride_tricks.sliding_window_view(X, seq_len, axis=0).transpose(0, 2, 1)
+    windows = np.ascontiguousarray(windows)
+    if y is None:
+        return windows
+    return windows, np.asarray(y, dtype=np.float32)[seq_len - 1:]
+
+
+class SklearnLikeLSTM:
+    """
+    DenseLSTM con interfaz fit(X, y) / predict(X) como los demás modelos: estandariza X e y con las
+    estadísticas del entrenamiento, arma ventanas de seq_len filas y predice cada fila de X usando como
+    contexto las últimas filas vistas en el entrenamiento.
+    """
+
+    def __init__(self, seq_len=3, hidden_dim=64, lstm_layers=2, bidirectional=True, dense=True,
+                 epochs=30, batch_size=128, lr=1e-3, device=None, random_state=42):
+        self.seq_len = seq_len
+        self.hidden_dim = hidden_dim
+        self.lstm_layers = lstm_layers
+        self.bidirectional = bidirectional
+        self.dense = dense
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.lr = lr
+        self.device = device
+        self.random_state = random_state
+        self.model = None
+        self.fitted = False
+
+    def _loader(self, inputs, labels=None, shuffle=False):
+        from torch.utils.data import DataLoader, TensorDataset
+        tensors = [torch.from_numpy(inputs)] + ([torch.from_numpy(labels)] if labels is not None else [])
+        return DataLoader(TensorDataset(*tensors), shuffle=shuffle, batch_size=self.batch_size)
+
+    def _scale_X(self, X):
+        return (np.asarray(X, dtype=np.float32) - self.x_mean) / self.x_std
+
+    def _train(self, inputs, labels, epochs):
+        loader = self._loader(inputs, labels, shuffle=True)
+        optimizer = torch.optim.Adam(self.model.parameters(), lr=self.lr)
+        # sin conjunto de prueba aparte: la pérdida de "test" que muestra fit es la del propio entrenamiento
+        self.model.fit(loader, self._loader(inputs, labels), optimizer, nn.MSELoss(), self.device, epochs=epochs)
+
+    def fit(self, X, y):
+        torch.manual_seed(self.random_state)
+        self.device = torch.device(self.device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y, dtype=np.float32)
+        if len(X) < self.seq_len:
+            raise ValueError(f"se necesitan al menos seq_len={self.seq_len} observaciones, hay {len(X)}")
+        self.x_mean, self.x_std = X.mean(axis=0), np.where(X.std(axis=0) > 0, X.std(axis=0), 1.0)
+        self.y_mean, self.y_std = float(y.mean()), float(y.std()) or 1.0
+
+        self.model = DenseLSTM(X.shape[1], self.hidden_dim, self.lstm_layers, self.bidirectional, self.dense)
+        self.model.to(self.device)
+        inputs, labels = make_sequences(self._scale_X(X), self.seq_len, (y - self.y_mean) / self.y_std)
+        self._train(inputs, labels, self.epochs)
+        # contexto para predecir después del entrenamiento
+        self.context = self._scale_X(X[-(self.seq_len - 1):]) if self.seq_len > 1 else self._scale_X(X[:0])
+        self.fitted = True
+        return self
+
+    def update(self, new_X, new_y, epochs=5):
+        """
+        Ajuste fino de epochs épocas desde los pesos actuales con las observaciones nuevas (más el contexto
+        del entrenamiento para las primeras ventanas), con la misma estandarización del ajuste original.
+        Modifica el modelo en su lugar, registra la actualización en updates y lo devuelve.
+        """
+        from updates import record_update
+        if not self.fitted:
+            raise RuntimeError("Debes entrenar el modelo antes de actualizarlo.")
+        start = time.time()
+        X = np.concatenate([self.context, self._scale_X(new_X)])
+        y = np.concatenate([
+            np.zeros(len(self.context), dtype=np.float32),
+            (np.asarray(new_y, dtype=np.float32) - self.y_mean) / self.y_std,
+        ])
+        inputs, labels = make_sequences(X, self.seq_len, y)
+        self._train(inputs, labels, epochs)
+        self.context = X[len(X) - (self.seq_len - 1):]
+        record_update(self, "lstm_finetune", new_X, time.time() - start, epochs=epochs)
+        return self
+
+    def predict(self, X):
+        if not self.fitted:
+            raise RuntimeError("Debes entrenar el modelo antes de predecir.")
+        inputs = make_sequences(np.concatenate([self.context, self._scale_X(X)]), self.seq_len)
+        pred = self.model.predict(self._loader(inputs), self.device)
+        return pred * self.y_std + self.y_mean
@@ -0,0 +1,267 @@
+"""
+Flujo completo de la app (descarga -> get_processed_data -> entrenamiento -> pronóstico) sin interfaz,
+para correr sobre muchos glaciares en paralelo (ver el comando batch de main.py).
+
+Cada sitio se procesa en un proceso del pool y deja sus resultados en out_dir/sites/<sitio>/:
+data.parquet (serie procesada), forecast_<modelo>.parquet, metrics_<modelo>.parquet y checkpoint.json
+con los pasos terminados. Al volver a correr con la misma configuración se saltan los pasos ya hechos,
+así que una corrida interrumpida continúa donde quedó. La descarga vence a las data_max_age horas: una
+corrida programada trae las observaciones nuevas y, si la serie cambió, reentrena los modelos. Al final
+se juntan los sitios de la corrida en out_dir/forecasts.parquet y out_dir/metrics.parquet.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+MODELS = ["xgboost", "gbr", "arima"]
+
+# una instancia de DATACUBETOOLS por proceso y catálogo
+_dcts = {}
+
+
+def load_sites(path):
+    """
+    Sitios {nombre: (lat, lon)} desde un JSON como glaciares.json ({nombre: [lat, lon]}) o un CSV con
+    columnas lat y lon (y opcionalmente name).
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            return {name: tuple(coords) for name, coords in json.load(f).items() if coords}
+    points = pd.read_csv(path)
+    names = points["name"] if "name" in points.columns else [f"{lat:.5f}_{lon:.5f}" for lat, lon in zip(points["lat"], points["lon"])]
+    return {str(name): (float(lat), float(lon)) for name, lat, lon in zip(names, points["lat"], points["lon"])}
+
+
+def site_slug(name):
+    """Nombre de directorio estable y legible para un sitio."""
+    readable = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")[:60]
+    return f"{readable}-{hashlib.sha1(name.encode()).hexdigest()[:8]}"
+
+
+def _get_dct(catalog):
+    if catalog not in _dcts:
+        if catalog is None:
+            from utils import get_dctools
+            _dcts[catalog] = get_dctools()
+        else:
+            from its_live.datacube_tools import DATACUBETOOLS
+            _dcts[catalog] = DATACUBETOOLS(use_catalog=catalog)
+    return _dcts[catalog]
+
+
+def _write_parquet(df, path):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+class Checkpoint:
+    """Pasos terminados de un sitio para una configuración (config_hash); otra configuración empieza de cero."""
+
+    def __init__(self, site_dir, config_hash):
+        self.path = os.path.join(site_dir, "checkpoint.json")
+        self.state = {"config": config_hash, "done": {}}
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            if saved.get("config") == config_hash:
+                self.state = saved
+        except (OSError, ValueError):
+            pass
+
+    def done(self, step, max_age=None):
+        """step terminado (y, con max_age en segundos, hace menos de max_age)"""
+        info = self.state["done"].get(step)
+        if info is None:
+            return False
+        return max_age is None or time.time() - info.get("ts", 0) < max_age
+
+    def info(self, step):
+        return self.state["done"].get(step, {})
+
+    def mark(self, step, **info):
+        self.state["done"][step] = {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "ts": time.time(), **info}
+        self.state.pop("error", None)
+        self._save()
+
+    def reset(self, steps):
+        """olvida steps (p. ej. los modelos cuando cambió la serie)"""
+        for step in steps:
+            self.state["done"].pop(step, None)
+        self._save()
+
+    def fail(self, step, error):
+        self.state["error"] = {"step": step, "error": error}
+        self._save()
+
+    def _save(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def _train(model_name, X_train, y_train, threads, cadence=None):
+    """Mismo entrenamiento que la app, con los hilos limitados a los del proceso."""
+    if model_name == "xgboost":
+        from model import get_xgboost_model
+        model, cv_results = get_xgboost_model(X_train, y_train, search="halving", nthread=threads)
+        best = cv_results["rank_test_score"].argmin()
+        return model, cv_results["mean_test_score"][best], cv_results["std_test_score"][best]
+    if model_name == "gbr":
+        from gbregresor_model import get_gbr_model
+        model, scores = get_gbr_model(X_train, y_train, engine="hist", n_jobs=1)
+        return model, scores.mean(), scores.std()
+    if model_name == "arima":
+        from arima_model import get_arima_model
+        # sin procesos hijos: el sitio ya corre en un proceso del pool
+        freq = pd.Timedelta(days=cadence) if cadence else "auto"
+        model, scores = get_arima_model(X_train, y_train, mode="rolling", freq=freq)
+        return model, scores.mean(), scores.std()
+    raise ValueError(f"unknown model {model_name!r}, expected one of {MODELS}")
+
+
+def run_site(name, lat, lon, out_dir, models=MODELS, min_dt=1, max_dt=120, cadence=None,
+             until="2030-12-31", catalog=None, store_dir=None, threads=1, data_max_age=24.0):
+    """
+    Procesa un sitio (con checkpoint) y devuelve un resumen {site, status, steps, error}.
+    Las observaciones se vuelven a traer si se descargaron hace más de data_max_age horas (None: nunca).
+    """
+    from timeseries_store import DEFAULT_STORE_DIR, TimeSeriesStore
+    from utils import get_future_dates, get_itslive, get_processed_data, resample_observations
+
+    warnings.filterwarnings("ignore")
+    site_dir = os.path.join(out_dir, "sites", site_slug(name))
+    os.makedirs(site_dir, exist_ok=True)
+    config = {"lat": lat, "lon": lon, "min_dt": min_dt, "max_dt": max_dt, "cadence": cadence,
+              "until": until, "catalog": catalog}
+    checkpoint = Checkpoint(site_dir, hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest())
+    data_path = os.path.join(site_dir, "data.parquet")
+    ran = []
+    step = "data"
+    max_age = data_max_age * 3600 if data_max_age else None
+    try:
+        if checkpoint.done(step, max_age):
+            glacier = pd.read_parquet(data_path)
+        else:
+            dct = _get_dct(catalog)
+            # el almacén solo lee del cubo las fechas nuevas
+            store = TimeSeriesStore(store_dir or DEFAULT_STORE_DIR, dct=dct, max_age=max_age or 0)
+            df = get_itslive([(lat, lon)], store=store)
+            glacier = get_processed_data(df, min_dt=min_dt, max_dt=max_dt, compact=True)
+            if cadence:
+                glacier = resample_observations(glacier, freq_days=cadence)
+            digest = hashlib.sha1(pd.util.hash_pandas_object(glacier).to_numpy().tobytes()).hexdigest()
+            if checkpoint.info(step).get("digest") != digest:
+                # serie nueva o con observaciones nuevas: los modelos se vuelven a entrenar
+                checkpoint.reset([done for done in list(checkpoint.state["done"]) if done != step])
+            _write_parquet(glacier, data_path)
+            checkpoint.mark(step, rows=len(glacier), digest=digest)
+            ran.append(step)
+
+        X = glacier[["year", "month", "dayofyear"]]
+        y = glacier["v"]
+        split_idx = int(len(X) * 0.66)
+        X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
+        y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
+        future_dates = get_future_dates(X_test.index[-1], until=until)
+
+        for model_name in models:
+            step = model_name
+            if checkpoint.done(step):
+                continue
+            start = time.perf_counter()
+            model, cv_mean, cv_std = _train(model_name, X_train, y_train, threads, cadence)
+            train_seconds = time.perf_counter() - start
+            y_pred = np.asarray(model.predict(X_test), dtype="float64")
+            future_pred = np.asarray(model.predict(future_dates[["year", "month", "dayofyear"]]), dtype="float64")
+
+            forecast = pd.DataFrame({
+                "mid_date": X_test.index.append(future_dates.index),
+                "split": ["test"] * len(X_test) + ["future"] * len(future_dates),
+                "v": np.concatenate([y_test.to_numpy(dtype="float64"), np.full(len(future_dates), np.nan)]),
+                "v_pred": np.concatenate([y_pred, future_pred]),
+            })
+            forecast.insert(0, "model", model_name)
+            forecast.insert(0, "site", name)
+            errors = y_test.to_numpy(dtype="float64") - y_pred
+            metrics = pd.DataFrame([{
+                "site": name, "lat": lat, "lon": lon, "model": model_name,
+                "n_train": len(X_train), "n_test": len(X_test),
+                "cv_mean": float(cv_mean), "cv_std": float(cv_std),
+                "test_rmse": float(np.sqrt(np.mean(errors**2))),
+                "test_mae": float(np.mean(np.abs(errors))),
+                "train_seconds": train_seconds,
+            }])
+            _write_parquet(forecast, os.path.join(site_dir, f"forecast_{model_name}.parquet"))
+            _write_parquet(metrics, os.path.join(site_dir, f"metrics_{model_name}.parquet"))
+            checkpoint.mark(step, train_seconds=train_seconds)
+            ran.append(step)
+    except Exception as e:
+        logging.warning(f"{name}: falló en {step}: {e!r}")
+        checkpoint.fail(step, repr(e))
+        return {"site": name, "status": "error", "steps": ran, "error": f"{step}: {e!r}"}
+    return {"site": name, "status": "ok", "steps": ran, "error": None}
+
+
+def _collect(out_dir, prefix, names):
+    """Une los archivos prefix*.parquet de los sitios names (no de otros sitios que haya en out_dir)."""
+    sites_dir = os.path.join(out_dir, "sites")
+    site_dirs = [os.path.join(sites_dir, site_slug(name)) for name in sorted(names)]
+    parts = [
+        pd.read_parquet(os.path.join(site_dir, file_name))
+        for site_dir in site_dirs
+        if os.path.isdir(site_dir)
+        for file_name in sorted(os.listdir(site_dir))
+        if file_name.startswith(prefix) and file_name.endswith(".parquet")
+    ]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def run_pipeline(sites, out_dir="results", models=MODELS, workers=None, min_dt=1, max_dt=120, cadence=None,
+                 until="2030-12-31", catalog=None, store_dir=None, fresh=False, data_max_age=24.0):
+    """
+    Corre run_site para cada {nombre: (lat, lon)} de sites en un pool de workers procesos (por defecto uno
+    por núcleo) y escribe out_dir/forecasts.parquet, out_dir/metrics.parquet y out_dir/runs.parquet con
+    los sitios de sites. Con fresh=True se borran los checkpoints y se recalcula todo; data_max_age (horas)
+    es la vigencia de las observaciones descargadas.
+    """
+    workers = workers or os.cpu_count()
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    if fresh:
+        for site in os.listdir(os.path.join(out_dir, "sites")) if os.path.isdir(os.path.join(out_dir, "sites")) else []:
+            try:
+                os.remove(os.path.join(out_dir, "sites", site, "checkpoint.json"))
+            except OSError:
+                pass
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                run_site, name, lat, lon, out_dir, list(models), min_dt, max_dt, cadence, until, catalog,
+                store_dir, threads, data_max_age,
+            ): name
+            for name, (lat, lon) in sites.items()
+        }
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries.append(summary)
+            detail = summary["error"] or (", ".join(summary["steps"]) or "sin cambios")
+            print(f"[{len(summaries)}/{len(futures)}] {summary['site']}: {summary['status']} ({detail})")
+
+    forecasts = _collect(out_dir, "forecast_", sites)
+    metrics = _collect(out_dir, "metrics_", sites)
+    _write_parquet(forecasts, os.path.join(out_dir, "forecasts.parquet"))
+    _write_parquet(metrics, os.path.join(out_dir, "metrics.parquet"))
+    runs = pd.DataFrame(summaries).assign(steps=lambda d: d["steps"].map(",".join))
+    _write_parquet(runs, os.path.join(out_dir, "runs.parquet"))
+    return runs
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+
+import pandas as pd
+
+DEFAULT_REGISTRY_DIR = os.path.join(
+    os.environ.get("FVICE_DATA_DIR", os.path.join(os.path.expanduser("~"), ".cache", "f-vice")),
+    "models",
+)
+
+class ModelRegistry:
+    """
+    Registro en disco de modelos entrenados y sus resultados de validación cruzada.
+
+    Cada entrada es root/<clave>.pkl, donde la clave (ModelRegistry.key) es un hash del contenido de la
+    serie de entrenamiento y de la configuración (coordenadas, min_dt, max_dt, modelo, hiperparámetros):
+    volver a entrenar lo mismo es solo leer el archivo. El tamaño total se mantiene bajo max_bytes
+    borrando primero las entradas usadas hace más tiempo (la fecha de modificación se renueva al leer).
+    """
+
+    def __init__(self, root=DEFAULT_REGISTRY_DIR, max_bytes=1024**3):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(X, y, coords=None, min_dt=None, max_dt=None, model_name=None, params=None):
+        """Hash hexadecimal de X, y (valores e índices) y de la configuración del entrenamiento."""
+        digest = hashlib.sha1()
+        digest.update(",".join(map(str, X.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+        digest.update(pd.util.hash_pandas_object(y, index=True).to_numpy().tobytes())
+        config = {
+            "coords": list(coords) if coords is not None else None,
+            "min_dt": min_dt,
+            "max_dt": max_dt,
+            "model": model_name,
+            "params": params or {},
+        }
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.pkl")
+
+    def get(self, key):
+        """Entrada {model, results, meta} guardada con key, o None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as inpkl:
+                entry = pickle.load(inpkl)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            # entrada de otra versión del código o a medio escribir: se descarta
+            logging.warning(f"Descartando modelo {key} del registro: {e!r}")
+            self.delete(key)
+            return None
+        return entry
+
+    def put(self, key, model, results, meta=None):
+        entry = {
+            "model": model,
+            "results": results,
+            "meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), **(meta or {})},
+        }
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as outpkl:
+            pickle.dump(entry, outpkl, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._evict(keep=path)
+        return entry
+
+    def get_or_train(self, key, train, meta=None):
+        """
+        (model, results, hit): lo guardado con key si existe (hit=True); si no, model, results = train(),
+        se guarda y se devuelve con hit=False.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry["model"], entry["results"], True
+        model, results = train()
+        self.put(key, model, results, meta)
+        return model, results, False
+
+    def update(self, key, new_X, new_y, **kwargs):
+        """
+        Actualiza en el lugar el modelo guardado con key usando updates.update_model (sin búsqueda de
+        hiperparámetros) y lo devuelve; la entrada conserva su clave original y meta["updates"] guarda el
+        historial. KeyError si no existe.
+        """
+        from updates import update_model
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        model = update_model(entry["model"], new_X, new_y, **kwargs)
+        meta = {**entry["meta"], "updates": list(getattr(model, "updates", []))}
+        self.put(key, model, entry["results"], meta)
+        return model
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def entries(self):
+        """(mtime, tamaño, ruta) de cada entrada, la usada hace más tiempo primero."""
+        found = []
+        for name in os.listdir(self.root):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, st.st_size, path))
+        return sorted(found)
+
+    def _evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
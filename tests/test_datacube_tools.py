@@ -0,0 +1,51 @@
+import json
+
+import pytest
+from pyproj import Transformer
+
+from benchmarks.synthetic import EPSG, ORIGIN, RESOLUTION, TILE_SIZE, make_synthetic_catalog, make_synthetic_cube
+from its_live.datacube_tools import DATACUBETOOLS
+
+NX = NY = 10
+TOP = ORIGIN[1] + TILE_SIZE
+
+
+@pytest.fixture(params=[1, 3], ids=["no-neighbour", "neighbour"])
+def dct(request, tmp_path):
+    """
+    Catálogo sintético con la caja del tile central (geometry_epsg) recortada 300 m por la izquierda:
+    los puntos de esa franja están en el polígono lon,lat pero no en la caja del cubo y pasan por la
+    búsqueda punto a punto. Con 1 tile no hay vecino (devuelve (None, None)); con 3 el vecino existe
+    pero no contiene el punto (timeseriesException).
+    """
+    cube = tmp_path / "cube.zarr"
+    catalog = tmp_path / "catalog.json"
+    make_synthetic_cube(str(cube), nx=NX, ny=NY, nt=30)
+    make_synthetic_catalog(str(catalog), str(cube), n_tiles=request.param)
+
+    with open(catalog) as f:
+        features = json.load(f)
+    for feature in features["features"]:
+        # el vecino de la izquierda también pierde 20 km, así el punto desplazado 10 km tampoco cae en su caja
+        shift = 300.0 if feature["properties"]["zarr_url"] == str(cube) else -20000.0
+        for corner in feature["properties"]["geometry_epsg"]["coordinates"][0]:
+            if corner[0] == ORIGIN[0]:
+                corner[0] += shift
+    with open(catalog, "w") as f:
+        json.dump(features, f)
+    return DATACUBETOOLS(str(catalog), cache_dir=str(tmp_path / "cache"))
+
+
+def test_batch_skips_points_outside_the_catalog(dct):
+    to_ll = Transformer.from_crs(EPSG, 4326, always_xy=True)
+    inside = to_ll.transform(ORIGIN[0] + RESOLUTION * NX / 2, TOP - RESOLUTION * NY / 2)
+    edge = to_ll.transform(ORIGIN[0] + RESOLUTION / 2, TOP - RESOLUTION * NY / 2)
+    points = [inside, edge, (0.0, 0.0), inside]
+
+    entries = dct.find_datacube_catalog_entries_for_points(points, "4326")
+    assert [feature is None for feature, _ in entries] == [False, True, True, False]
+    assert entries[1] == entries[2] == (None, None)
+
+    df = dct.get_timeseries_at_points(points, "4326", variables=["v"])
+    assert set(df["point"]) == {0, 3}
+    assert len(df) == 2 * 30
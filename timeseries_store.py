@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+DEFAULT_STORE_DIR = os.path.join(
+    os.environ.get("FVICE_DATA_DIR", os.path.join(os.path.expanduser("~"), ".cache", "f-vice")),
+    "timeseries",
+)
+
+class TimeSeriesStore:
+    """
+    Almacén local e incremental de series de tiempo por punto en Parquet particionado.
+
+    Cada serie se identifica por (URL del cubo, índice x, índice y, variables) y vive en
+    root/cube=<hash>/x=<ix>/y=<iy>/vars=<hash>/ como archivos part-*.parquet. Al refrescar
+    solo se leen del cubo las observaciones con mid_date posterior a la última guardada y se
+    agregan como una nueva parte; las consultas repetidas se leen del disco local.
+
+    La celda (URL del cubo, ix, iy) de cada (lat, lon) se guarda en root/_meta.json, así que una
+    consulta repetida no vuelve a buscar en el catálogo ni a abrir el cubo. get_point(refresh=True)
+    solo vuelve al cubo si la serie se refrescó hace más de max_age segundos (el _meta.json de cada
+    partición guarda cuándo), y al hacerlo reabre el cubo para ver las fechas agregadas desde que
+    se abrió.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, dct=None, max_age=6 * 3600):
+        self.root = root
+        self._dct = dct
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    @property
+    def dct(self):
+        if self._dct is None:
+            from utils import get_dctools
+            self._dct = get_dctools()
+        return self._dct
+
+    def partition_dir(self, cube_url, ix, iy, columns):
+        cube_id = hashlib.sha1(cube_url.encode()).hexdigest()[:16]
+        vars_id = hashlib.sha1(",".join(columns).encode()).hexdigest()[:12]
+        return os.path.join(self.root, f"cube={cube_id}", f"x={ix}", f"y={iy}", f"vars={vars_id}")
+
+    def read(self, cube_url, ix, iy, columns):
+        path = self.partition_dir(cube_url, ix, iy, columns)
+        if not os.path.isdir(path) or not any(f.endswith(".parquet") for f in os.listdir(path)):
+            return pd.DataFrame()
+        return pd.read_parquet(path)
+
+    def refresh(self, cube_url, ix, iy, columns):
+        """Agrega las observaciones nuevas del cubo y devuelve la serie completa."""
+        stored = self.read(cube_url, ix, iy, columns)
+        last = stored["mid_date"].max() if not stored.empty else None
+        # el cubo abierto en el pool conserva el índice mid_date de cuando se abrió: se reabre
+        self.dct.open_cubes.discard(cube_url)
+        new = pd.DataFrame(
+            self.dct.get_timeseries_columns_at_index(cube_url, ix, iy, columns, mid_date_after=last)
+        )
+        if not new.empty:
+            self._write_part(cube_url, ix, iy, columns, new)
+        self._write_meta(cube_url, ix, iy, columns)
+        if new.empty:
+            return stored
+        return pd.concat([stored, new], ignore_index=True) if not stored.empty else new
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, cube_url, ix, iy, columns):
+        path = self.partition_dir(cube_url, ix, iy, columns)
+        os.makedirs(path, exist_ok=True)
+        self._write_json(os.path.join(path, "_meta.json"), {
+            "cube_url": cube_url, "x": ix, "y": iy, "columns": list(columns), "refreshed": time.time(),
+        })
+
+    def _is_fresh(self, cube_url, ix, iy, columns):
+        meta = self._read_json(os.path.join(self.partition_dir(cube_url, ix, iy, columns), "_meta.json"))
+        return time.time() - meta.get("refreshed", 0) < self.max_age
+
+    def _point_key(self, lat, lon):
+        # la misma coordenada puede caer en otro cubo con otro catálogo
+        catalog = getattr(self.dct, "_current_catalog", None)
+        catalog = getattr(self.dct, "catalog", {}).get(catalog, catalog)
+        return f"{catalog}|{float(lat):.6f},{float(lon):.6f}"
+
+    def locate(self, lat, lon):
+        """(URL del cubo, ix, iy) de (lat, lon): de root/_meta.json o buscado en el catálogo y guardado ahí."""
+        key = self._point_key(lat, lon)
+        meta_file = os.path.join(self.root, "_meta.json")
+        location = self._read_json(meta_file).get("points", {}).get(key)
+        if location is not None:
+            return tuple(location)
+        location = self.dct.locate_point([lon, lat], "4326")
+        if location is not None:
+            os.makedirs(self.root, exist_ok=True)
+            with self._lock:
+                meta = self._read_json(meta_file)
+                meta.setdefault("points", {})[key] = list(location)
+                self._write_json(meta_file, meta)
+        return location
+
+    def _write_part(self, cube_url, ix, iy, columns, df):
+        path = self.partition_dir(cube_url, ix, iy, columns)
+        os.makedirs(path, exist_ok=True)
+        part = os.path.join(path, f"part-{time.time_ns()}.parquet")
+        # se escribe con prefijo "_" (ignorado al leer) y se renombra para no exponer partes a medias
+        tmp = os.path.join(path, f"_{os.path.basename(part)}.{os.getpid()}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, part)
+
+    def get_point(self, lat, lon, columns, refresh=True):
+        """
+        Serie del punto (lat, lon) desde el almacén local. Con refresh=True antes se trae lo nuevo del cubo
+        si la serie se refrescó hace más de max_age segundos; con refresh=False solo si no hay nada guardado.
+        """
+        location = self.locate(lat, lon)
+        if location is None:
+            return pd.DataFrame()
+        stored = self.read(*location, columns)
+        if stored.empty or (refresh and not self._is_fresh(*location, columns)):
+            return self.refresh(*location, columns)
+        return stored
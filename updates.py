@@ -0,0 +1,45 @@
+"""
+Actualización incremental de modelos ya entrenados con observaciones nuevas de ITS_LIVE, sin volver a
+hacer la búsqueda de hiperparámetros:
+
+- XGBoost (model.get_xgboost_model): sigue agregando árboles al booster existente.
+- ARIMA (arima_model.SklearnLikeARIMA): extiende el estado del filtro sin reestimar parámetros.
+- DenseLSTM (neural.SklearnLikeLSTM): unas pocas épocas más desde los pesos actuales.
+
+Cada actualización queda registrada en model.updates (lista de dicts con fecha, tipo, número y rango de
+observaciones nuevas y duración).
+"""
+import time
+
+
+def record_update(model, kind, new_X, seconds, **info):
+    """Agrega la actualización a model.updates y devuelve el registro."""
+    index = getattr(new_X, "index", None)
+    entry = {
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "kind": kind,
+        "n_obs": len(new_X),
+        "first": str(index[0]) if index is not None and len(index) else None,
+        "last": str(index[-1]) if index is not None and len(index) else None,
+        "seconds": seconds,
+        **info,
+    }
+    model.updates = list(getattr(model, "updates", [])) + [entry]
+    return entry
+
+
+def update_model(model, new_X, new_y, **kwargs):
+    """
+    Modelo actualizado con (new_X, new_y), posteriores a lo ya visto, según su tipo. Los kwargs van al
+    método de cada familia (num_boost_round para XGBoost, epochs para el LSTM).
+    """
+    if hasattr(model, "update"):
+        return model.update(new_X, new_y, **kwargs)
+    try:
+        import xgboost as xgb
+    except ImportError:
+        xgb = None
+    if xgb is not None and isinstance(model, xgb.XGBModel):
+        from model import update_xgboost_model
+        return update_xgboost_model(model, new_X, new_y, **kwargs)
+    raise TypeError(f"{type(model).__name__} no admite actualización incremental; hay que reentrenarlo")
@@ -1,28 +1,149 @@
 from its_live.datacube_tools import DATACUBETOOLS as dctools
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import numpy as np
 import pandas as pd
 
-def get_itslive(coords_list, variable="v"):
-    dct = dctools()
-    dfs = []
-    for lat, lon in coords_list:
-        ins3xr, ds_point, point_tilexy = dct.get_timeseries_at_point([lon, lat], "4326", variables=[variable])
-        if ins3xr is not None and point_tilexy is not None:
-            export = ins3xr[
-                ["v", "v_error", "vx", "vx_error", "vy", "vy_error", "date_dt", "satellite_img1", "mission_img1"]
-            ].sel(x=point_tilexy[0], y=point_tilexy[1], method="nearest")
-            df = export.to_dataframe().reset_index()
-            df["lat"] = lat
-            df["lon"] = lon
-            dfs.append(df)
-    if dfs:
-        return pd.concat(dfs, ignore_index=True)
-    else:
+_dctools = None
+
+def get_dctools():
+    """Instancia compartida de DATACUBETOOLS: el catálogo y los cubos abiertos se reutilizan entre llamadas."""
+    global _dctools
+    if _dctools is None:
+        _dctools = dctools()
+    return _dctools
+
+ITSLIVE_COLUMNS = ["v", "v_error", "vx", "vx_error", "vy", "vy_error", "date_dt", "satellite_img1", "mission_img1"]
+
+def _itslive_columns(variable):
+    return ITSLIVE_COLUMNS if variable in ITSLIVE_COLUMNS else [variable] + ITSLIVE_COLUMNS
+
+def _fetch_point(dct, lat, lon, columns):
+    # cada variable se lee una sola vez y el DataFrame se arma directo de los arreglos
+    point_columns = dct.get_timeseries_columns_at_point([lon, lat], "4326", columns)
+    if point_columns is None:
+        return pd.DataFrame()
+    df = pd.DataFrame(point_columns)
+    df["lat"] = lat
+    df["lon"] = lon
+    return df
+
+async def aiter_itslive(coords_list, variable="v", concurrency=8, timeout=120.0, retries=2, backoff=1.0, dct=None):
+    """
+    Descarga los puntos de forma concurrente (hasta `concurrency` a la vez) y entrega (lat, lon, df)
+    conforme cada punto termina. Cada intento tiene un límite de `timeout` segundos y se reintenta
+    hasta `retries` veces con espera exponencial; si todos fallan se entrega un DataFrame vacío.
+
+    Un hilo no se puede cancelar: el intento que vence sigue corriendo hasta terminar y su resultado se
+    descarta. Cada intento ocupa un cupo del pool (concurrency * (retries + 1) hilos) que libera el propio
+    hilo al terminar, abandonado o no; sin cupo libre el intento espera sin consumir su `timeout`, que
+    empieza a contar cuando el hilo arranca. Durante la espera entre reintentos el punto no ocupa lugar
+    en `concurrency`.
+    """
+    dct = dct or get_dctools()
+    columns = _itslive_columns(variable)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    workers = concurrency * (retries + 1)
+    slots = asyncio.Semaphore(workers)
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    def notify(callback, *args):
+        # desde el hilo: el loop puede haber terminado si el intento quedó abandonado
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass
+
+    def run(started, lat, lon):
+        notify(lambda: started.done() or started.set_result(None))
+        try:
+            return _fetch_point(dct, lat, lon, columns)
+        finally:
+            notify(slots.release)
+
+    async def attempt(lat, lon):
+        await slots.acquire()
+        started = loop.create_future()
+        try:
+            result = loop.run_in_executor(executor, run, started, lat, lon)
+        except BaseException:
+            slots.release()
+            raise
+        # el timeout cuenta desde que el hilo toma el intento (o desde que el intento se cancela sin correr)
+        await asyncio.wait([started, result], return_when=asyncio.FIRST_COMPLETED)
+        return await asyncio.wait_for(result, timeout)
+
+    async def fetch(lat, lon):
+        for n in range(retries + 1):
+            try:
+                async with semaphore:
+                    df = await attempt(lat, lon)
+                return lat, lon, df
+            except Exception as e:
+                if n == retries:
+                    logging.warning(f"ITS_LIVE ({lat}, {lon}) falló tras {retries + 1} intentos: {e!r}")
+                    return lat, lon, pd.DataFrame()
+            await asyncio.sleep(backoff * 2**n)
+
+    try:
+        for next_done in asyncio.as_completed([fetch(lat, lon) for lat, lon in coords_list]):
+            yield await next_done
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def get_itslive(coords_list, variable="v", concurrency=None, timeout=120.0, retries=2, store=None, dct=None):
+    """
+    Serie de tiempo ITS_LIVE para cada (lat, lon) de coords_list en un solo DataFrame.
+    Sin `concurrency` los puntos se leen en lote, agrupados por cubo; con `concurrency` se descargan
+    punto por punto de forma concurrente (ver aiter_itslive). No usar `concurrency` dentro de un
+    event loop ya activo (p. ej. Jupyter): ahí se debe iterar aiter_itslive directamente.
+    Con `store` (TimeSeriesStore) cada punto se lee del almacén local y solo se descargan
+    las observaciones nuevas. `dct` permite usar otra instancia de DATACUBETOOLS (p. ej. un
+    catálogo local) en lugar de la compartida.
+    """
+    if store is not None:
+        dfs = []
+        for lat, lon in coords_list:
+            df = store.get_point(lat, lon, _itslive_columns(variable))
+            if not df.empty:
+                df["lat"] = lat
+                df["lon"] = lon
+                dfs.append(df)
+        return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
+    if concurrency is not None:
+        async def collect():
+            return [
+                df async for _, _, df in aiter_itslive(
+                    coords_list, variable, concurrency=concurrency, timeout=timeout, retries=retries, dct=dct
+                )
+            ]
+        dfs = [df for df in asyncio.run(collect()) if not df.empty]
+        return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
+    dct = dct or get_dctools()
+    coords = np.asarray(coords_list, dtype=float).reshape(-1, 2)
+    # todos los puntos en una sola llamada: se agrupan por cubo y cada chunk se lee una vez
+    df = dct.get_timeseries_at_points(coords[:, ::-1], "4326", variables=_itslive_columns(variable))
+    if df.empty:
         return pd.DataFrame()
+    df["lat"] = coords[df["point"].to_numpy(), 0]
+    df["lon"] = coords[df["point"].to_numpy(), 1]
+    return df.drop(columns=["point", "cube_url"])
     
-def get_processed_data(df, min_dt=1, max_dt=120):
+def get_processed_data(df, min_dt=1, max_dt=120, compact=False):
+    """
+    Filtra las observaciones con v y separación entre imágenes (date_dt) en [min_dt, max_dt] días,
+    indexa por mid_date y agrega year, month y dayofyear.
+    Con compact=True se usa el modo de baja memoria (ver _get_processed_data_compact).
+    """
     if df.empty:
         raise ValueError("DataFrame is empty. No data to process.")
-    
+    if compact:
+        return _get_processed_data_compact(df, min_dt, max_dt)
+
     df = df.dropna(subset=["v"]).copy()
     df.index = pd.to_datetime(df["mid_date"], utc=True)
     min_dt = pd.Timedelta(days=min_dt)
@@ -39,6 +160,110 @@ def get_processed_data(df, min_dt=1, max_dt=120):
 
     return df
 
+COMPACT_CATEGORICAL = ["satellite_img1", "mission_img1"]
+# coordenadas del punto: float32 no alcanza para distinguir pixeles vecinos
+COMPACT_KEEP_FLOAT64 = ["lat", "lon", "x", "y"]
+
+def _get_processed_data_compact(df, min_dt, max_dt):
+    """
+    Igual que get_processed_data pero sin copias del DataFrame completo:
+    - un solo arreglo de índices (filtro + orden por fecha) con el que se toma cada columna una vez
+    - valores en float32 y v sin redondear a entero
+    - satellite_img1 / mission_img1 como categorías
+    - date_dt como número entero de días
+    """
+    # fechas en UTC como datetime64 sin zona para ordenar y tomar con índices
+    mid_date = df["mid_date"]
+    if isinstance(mid_date.dtype, pd.DatetimeTZDtype):
+        mid_date = mid_date.dt.tz_convert(None)
+    elif not pd.api.types.is_datetime64_dtype(mid_date):
+        mid_date = pd.to_datetime(mid_date, utc=True).dt.tz_convert(None)
+    mid_date = mid_date.to_numpy()
+    date_dt = df["date_dt"].to_numpy()
+    if np.issubdtype(date_dt.dtype, np.timedelta64):
+        date_dt = date_dt / np.timedelta64(1, "D")
+    date_dt = date_dt.astype("float64", copy=False)
+
+    keep = ~np.isnan(df["v"].to_numpy(dtype="float64")) & (date_dt >= min_dt) & (date_dt <= max_dt)
+    idx = np.flatnonzero(keep)
+    idx = idx[np.argsort(mid_date[idx], kind="stable")]
+
+    index = pd.DatetimeIndex(mid_date[idx], name="mid_date").tz_localize("UTC")
+    columns = {}
+    for name in df.columns:
+        if name == "mid_date":
+            continue
+        if name == "date_dt":
+            columns[name] = np.rint(date_dt[idx]).astype("int16")
+            continue
+        if name in COMPACT_CATEGORICAL:
+            codes, categories = pd.factorize(df[name], sort=True)
+            columns[name] = pd.Categorical.from_codes(codes[idx], categories)
+            continue
+        values = df[name].to_numpy()[idx]
+        if values.dtype.kind == "f" and name not in COMPACT_KEEP_FLOAT64:
+            columns[name] = values.astype("float32")
+        else:
+            columns[name] = values
+    # int32: arima_model arma fechas con year * 1000 + dayofyear
+    columns["year"] = index.year.to_numpy().astype("int32")
+    columns["month"] = index.month.to_numpy().astype("int32")
+    columns["dayofyear"] = index.dayofyear.to_numpy().astype("int32")
+    return pd.DataFrame(columns, index=index)
+
+def resample_observations(glacier, freq_days=12, variables=("v",), dropna=True):
+    """
+    Agrupa las observaciones de get_processed_data en intervalos regulares de freq_days días.
+
+    Cada variable se promedia con pesos 1 / <variable>_error² (o v_error si no existe; las observaciones
+    sin error usan la mediana de los pesos) y por intervalo se guarda el promedio, su incertidumbre
+    (<variable>_error = 1 / sqrt(suma de pesos)), la dispersión ponderada (<variable>_std) y el número de
+    observaciones (count). El índice es el inicio de cada intervalo, con year, month y dayofyear.
+    Con dropna=False se devuelven también los intervalos vacíos (NaN) y el índice lleva su frecuencia.
+    """
+    if glacier.empty:
+        raise ValueError("DataFrame is empty. No data to resample.")
+    index = pd.DatetimeIndex(glacier.index)
+    step = pd.Timedelta(days=freq_days)
+    origin = index.min().floor("D")
+    bins = ((index - origin) // step).to_numpy().astype("int64")
+    n_bins = int(bins.max()) + 1
+
+    columns = {"count": np.bincount(bins, minlength=n_bins)}
+    for var in variables:
+        values = glacier[var].to_numpy(dtype="float64")
+        error_col = f"{var}_error" if f"{var}_error" in glacier.columns else "v_error"
+        if error_col in glacier.columns:
+            errors = glacier[error_col].to_numpy(dtype="float64")
+            with np.errstate(divide="ignore", invalid="ignore"):
+                weights = 1.0 / errors**2
+            known = np.isfinite(weights) & (weights > 0)
+            weights[~known] = np.median(weights[known]) if known.any() else 1.0
+        else:
+            weights = np.ones_like(values)
+        weights[np.isnan(values)] = 0.0
+        values = np.nan_to_num(values)
+
+        sum_w = np.bincount(bins, weights, n_bins)
+        sum_wv = np.bincount(bins, weights * values, n_bins)
+        sum_wv2 = np.bincount(bins, weights * values**2, n_bins)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = sum_wv / sum_w
+            columns[var] = mean
+            columns[f"{var}_error"] = 1.0 / np.sqrt(sum_w)
+            columns[f"{var}_std"] = np.sqrt(np.maximum(sum_wv2 / sum_w - mean**2, 0.0))
+
+    binned = pd.DataFrame(
+        columns,
+        index=pd.date_range(origin, periods=n_bins, freq=f"{freq_days}D", name=index.name),
+    )
+    if dropna:
+        binned = binned[binned["count"] > 0]
+    binned["year"] = binned.index.year
+    binned["month"] = binned.index.month
+    binned["dayofyear"] = binned.index.dayofyear
+    return binned
+
 def get_future_dates(start, until='2030-12-31'):
     start_date = (start + pd.Timedelta(days=1))
     end_date = pd.Timestamp(until, tz='UTC')